@@ -0,0 +1,131 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Call overhead of the picklable combinators, compared with the closures
+they replace.
+
+    > python benchmarks/combinators.py
+
+The `CASES` are also part of `suite.py`.
+"""
+import math
+import operator
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yamft import star, unstar, flip, partial_r, dot, either, dget, split1, add1, eq1
+
+
+def closure_star(func):
+    return lambda args: func(*args)
+
+
+def closure_unstar(func):
+    return lambda *args: func(args)
+
+
+def closure_flip(func):
+    def wrapped(b, a, *args, **kwargs):
+        return func(a, b, *args, **kwargs)
+    return wrapped
+
+
+def closure_partial_r(func, *p_args, **p_kwargs):
+    def wrapped(*args, **kwargs):
+        new_kwargs = {**p_kwargs, **kwargs}
+        return func(*args, *p_args, **new_kwargs)
+    return wrapped
+
+
+def closure_dot(*funcs):
+    def wrapped(*args, **kwargs):
+        it = reversed(funcs)
+        try:
+            first_func = next(it)
+            ret = first_func(*args, **kwargs)
+            for func in it:
+                ret = func(ret, **kwargs)
+        except StopIteration:
+            ret = args
+        return ret
+    return wrapped
+
+
+def closure_either(func, *excs):
+    exc = tuple(excs) if excs else Exception
+
+    def wrapped(*args, **kwargs):
+        try:
+            return func(*args, **kwargs), None
+        except exc as e:
+            return None, e
+    return wrapped
+
+
+def closure_dget(k, d=None):
+    return lambda D: D.get(k, d)
+
+
+def closure_split1(sep=None, maxsplits=-1):
+    return lambda s: s.split(sep, maxsplits)
+
+
+def closure_add1(b):
+    def wrapped(a):
+        return a + b
+    return wrapped
+
+
+def closure_eq1(b):
+    def wrapped(a):
+        return a == b
+    return wrapped
+
+
+CASES = [
+    ("star", closure_star(math.pow), star(math.pow), ([2, 8],)),
+    ("unstar", closure_unstar(sum), unstar(sum), (1, 2, 3)),
+    ("flip", closure_flip(operator.sub), flip(operator.sub), (1, 0)),
+    ("partial_r", closure_partial_r(operator.sub, 1), partial_r(operator.sub, 1), (10,)),
+    ("dot", closure_dot(str, abs, int), dot(str, abs, int), ("-3",)),
+    ("either", closure_either(int, ValueError), either(int, ValueError), ("3",)),
+    ("dget", closure_dget('a'), dget('a'), ({'a': 1},)),
+    ("split1", closure_split1('='), split1('='), ("a=b",)),
+    ("add1", closure_add1(1), add1(1), (1,)),
+    ("eq1", closure_eq1(1), eq1(1), (1,)),
+]
+
+
+def bench(func, args, number=200000, repeat=5):
+    """Return the best time per call, in ns"""
+    return min(timeit.repeat(lambda: func(*args), number=number, repeat=repeat)) / number * 1e9
+
+
+def main():
+    print(f"{'combinator':<12}{'closure (ns)':>14}{'yamft (ns)':>14}{'ratio':>8}")
+    for name, closure, combinator, args in CASES:
+        t_closure = bench(closure, args)
+        t_combinator = bench(combinator, args)
+        print(f"{name:<12}{t_closure:>14.1f}{t_combinator:>14.1f}{t_combinator / t_closure:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
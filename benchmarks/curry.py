@@ -0,0 +1,64 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Call overhead of `autocurry`, compared with hand-written lambdas and nested
+`curry` calls.
+
+    > python benchmarks/curry.py
+
+The `CASES` are also part of `suite.py`.
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yamft import autocurry, curry
+
+
+def f3(a, b, c):
+    return a + b + c
+
+
+lambda_f3 = lambda a: lambda b: lambda c: f3(a, b, c)
+auto_f3 = autocurry(f3)
+curry_f3 = curry(lambda a, b: curry(lambda b, c: f3(a, b, c))(b))
+
+CASES = [
+    ("direct f(1, 2, 3)", lambda: f3(1, 2, 3)),
+    ("lambdas f(1)(2)(3)", lambda: lambda_f3(1)(2)(3)),
+    ("curry f(1)(2)(3)", lambda: curry_f3(1)(2)(3)),
+    ("autocurry f(1)(2)(3)", lambda: auto_f3(1)(2)(3)),
+    ("autocurry f(1, 2)(3)", lambda: auto_f3(1, 2)(3)),
+    ("autocurry f(1, 2, 3)", lambda: auto_f3(1, 2, 3)),
+]
+
+
+def bench(func, number=200000, repeat=5):
+    """Return the best time per call, in ns"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+def main():
+    for name, func in CASES:
+        print(f"{name:<24}{bench(func):>10.1f} ns")
+
+
+if __name__ == '__main__':
+    main()
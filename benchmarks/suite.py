@@ -0,0 +1,253 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""The benchmark suite: every yamft helper against its plain Python
+equivalent (comprehension, `itertools`, `operator`), on several input sizes.
+
+    > python benchmarks/suite.py --sizes 10 1000 --json results.json
+    > python benchmarks/suite.py --baseline results.json --threshold 1.1
+
+Each measure is warmed up, then repeated; the statistics are computed on the
+time per run. With `--baseline`, the results are compared with the stored
+results (by default on the minimum, the least noisy statistic), and the exit code is 1 if a yamft case is slower than the baseline
+by more than the threshold. The comparison is made on the ratio yamft/plain,
+that does not depend much on the machine: a baseline recorded on a developer
+machine can gate a CI run. The call overhead cases of `combinators.py` and
+`curry.py` are part of the suite, with the closures and the lambdas as the
+plain equivalents.
+"""
+import argparse
+import fnmatch
+import functools
+import itertools
+import json
+import operator
+import os
+import platform
+import statistics
+import sys
+import timeit
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import combinators
+import curry
+from yamft import dot, map_star, partial_r, either, group_by, reduce_r, filter_map, mod1
+
+
+class Case:
+    """A benchmark: `setup(size)` returns the input, `yamft(data)` and
+    `plain(data)` compute the same result. The sizes above `max_size` are
+    skipped (e.g. `reduce_r` is recursive); `sizes` replaces the sizes of the
+    command line (e.g. for the call overhead)."""
+    def __init__(self, name, setup, yamft, plain, max_size=None, sizes=None):
+        self.name = name
+        self.setup = setup
+        self.yamft = yamft
+        self.plain = plain
+        self.max_size = max_size
+        self.sizes = sizes
+
+
+def _ints(size):
+    return [i - size // 2 for i in range(size)]
+
+
+def _strs(size):
+    return [str(i) if i % 10 else "x" for i in range(size)]
+
+
+def _pairs(size):
+    return [(i % 7, 2) for i in range(size)]
+
+
+def _plain_either(data):
+    ret = []
+    for s in data:
+        try:
+            ret.append((int(s), None))
+        except ValueError as e:
+            ret.append((None, e))
+    return ret
+
+
+def _plain_filter_map(data):
+    ret = []
+    for s in data:
+        try:
+            ret.append(int(s))
+        except ValueError:
+            pass
+    return ret
+
+
+def _plain_group_by(data):
+    groups = defaultdict(list)
+    for x in data:
+        groups[x % 10].append(x)
+    return groups
+
+
+_str_abs = dot(str, abs)
+_int_16 = partial_r(int, 16)
+_either_int = either(int, ValueError)
+_mod10 = mod1(10)
+
+CASES = [
+    Case("dot", _ints,
+         lambda data: list(map(_str_abs, data)),
+         lambda data: [str(abs(x)) for x in data]),
+    Case("map_star", _pairs,
+         lambda data: list(map_star(pow, data)),
+         lambda data: list(itertools.starmap(pow, data))),
+    Case("partial_r", lambda size: [format(i, 'x') for i in range(size)],
+         lambda data: list(map(_int_16, data)),
+         lambda data: [int(x, 16) for x in data]),
+    Case("either", _strs,
+         lambda data: list(map(_either_int, data)),
+         _plain_either),
+    Case("filter_map", _strs,
+         lambda data: list(filter_map(_either_int, data)),
+         _plain_filter_map),
+    Case("group_by", _ints,
+         lambda data: group_by(_mod10, data),
+         _plain_group_by),
+    Case("reduce_r", _ints,
+         lambda data: reduce_r(lambda x, acc: x + acc(), data, lambda: 0),
+         lambda data: functools.reduce(operator.add, reversed(data), 0),
+         max_size=200),
+]
+
+# the call overhead cases: one call, the size is ignored
+CASES += [Case("call:" + name, lambda size, args=args: args,
+               lambda args, f=combinator: f(*args),
+               lambda args, f=closure: f(*args), sizes=[1])
+          for name, closure, combinator, args in combinators.CASES]
+CASES += [Case("curry:" + name, lambda size: None,
+               lambda _, f=func: f(),
+               lambda _: curry.lambda_f3(1)(2)(3), sizes=[1])
+          for name, func in curry.CASES if name.startswith("autocurry")]
+
+
+def measure(func, data, warmup, repeat, min_time):
+    """Return (number of runs per measure, the times per run in s)"""
+    timer = timeit.Timer(lambda: func(data))
+    number = 1
+    # these runs are the first warmup
+    while timer.timeit(number) < min_time:
+        number *= 2
+    for _ in range(warmup):
+        timer.timeit(number)
+    return number, [t / number for t in timer.repeat(repeat, number)]
+
+
+def run(cases, sizes, warmup, repeat, min_time):
+    results = []
+    for case in cases:
+        for size in case.sizes or sizes:
+            if case.max_size is not None and size > case.max_size:
+                continue
+            data = case.setup(size)
+            for impl in ("yamft", "plain"):
+                number, times = measure(getattr(case, impl), data, warmup, repeat, min_time)
+                results.append({
+                    "case": case.name, "impl": impl, "size": size, "number": number,
+                    "times": times, "min": min(times), "median": statistics.median(times),
+                    "mean": statistics.mean(times),
+                    "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+                })
+    return results
+
+
+def _ratios(results, stat="median"):
+    """Return {(case, size): yamft stat / plain stat}"""
+    values = {(r["case"], r["impl"], r["size"]): r[stat] for r in results}
+    return {(case, size): value / values[case, "plain", size]
+            for (case, impl, size), value in values.items()
+            if impl == "yamft" and (case, "plain", size) in values}
+
+
+def compare(results, baseline, threshold, stat="min"):
+    """Return the rows (case, size, baseline ratio, ratio, change) and the
+    list of the regressions"""
+    old = _ratios(baseline, stat)
+    rows = []
+    regressions = []
+    for key, ratio in _ratios(results, stat).items():
+        if key not in old:
+            continue
+        change = ratio / old[key]
+        rows.append((*key, old[key], ratio, change))
+        if change > threshold:
+            regressions.append(key)
+    return rows, regressions
+
+
+def print_results(results):
+    print(f"{'case':<28}{'size':>7}{'yamft (us)':>12}{'plain (us)':>12}{'ratio':>8}{'stdev %':>9}")
+    by_key = {(r["case"], r["impl"], r["size"]): r for r in results}
+    for (case, size), ratio in _ratios(results).items():
+        y = by_key[case, "yamft", size]
+        p = by_key[case, "plain", size]
+        print(f"{case:<28}{size:>7}{y['median'] * 1e6:>12.3f}{p['median'] * 1e6:>12.3f}"
+              f"{ratio:>8.2f}{y['stdev'] / y['mean'] * 100:>9.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 100000])
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.2,
+                        help="the minimal duration of a measure, in s")
+    parser.add_argument("--filter", default="*", help="a glob pattern on the case names")
+    parser.add_argument("--json", help="write the results to this file")
+    parser.add_argument("--baseline", help="compare the results with this file")
+    parser.add_argument("--threshold", type=float, default=1.1,
+                        help="the maximum slowdown of a ratio yamft/plain")
+    parser.add_argument("--stat", choices=["min", "median", "mean"], default="min",
+                        help="the statistic compared with the baseline")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if fnmatch.fnmatch(case.name, args.filter)]
+    results = run(cases, sorted(args.sizes), args.warmup, args.repeat, args.min_time)
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": platform.python_version(),
+                       "implementation": platform.python_implementation(),
+                       "machine": platform.machine(),
+                       "results": results}, f, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        rows, regressions = compare(results, baseline, args.threshold, args.stat)
+        print()
+        print(f"{'case':<28}{'size':>7}{'baseline':>10}{'ratio':>8}{'change':>8}")
+        for case, size, old, new, change in rows:
+            mark = " !" if (case, size) in regressions else ""
+            print(f"{case:<28}{size:>7}{old:>10.2f}{new:>8.2f}{change:>8.2f}{mark}")
+        if regressions:
+            print(f"{len(regressions)} regression(s) above {args.threshold}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
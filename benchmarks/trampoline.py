@@ -0,0 +1,72 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Overhead per call of `trampoline`, compared with a plain recursion and a
+hand-written loop, on a tail recursive sum of 0..n-1. The plain recursion is
+limited by the recursion limit.
+
+    > python benchmarks/trampoline.py
+"""
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yamft import trampoline, tail_call
+
+N = 500
+
+
+def plain_sum(n, acc=0):
+    return plain_sum(n - 1, acc + n - 1) if n else acc
+
+
+@trampoline
+def trampoline_sum(n, acc=0):
+    return tail_call(trampoline_sum, n - 1, acc + n - 1) if n else acc
+
+
+def loop_sum(n, acc=0):
+    while n:
+        n, acc = n - 1, acc + n - 1
+    return acc
+
+
+CASES = [
+    ("plain recursion", plain_sum),
+    ("trampoline", trampoline_sum),
+    ("loop", loop_sum),
+]
+
+
+def bench(func, n, number=200, repeat=5):
+    """Return the best time per recursive call, in ns"""
+    return min(timeit.repeat(lambda: func(n), number=number, repeat=repeat)) / number / n * 1e9
+
+
+def main():
+    for name, func in CASES:
+        print(f"{name:<24}{bench(func, N):>10.1f} ns/call")
+    n = 10 * sys.getrecursionlimit()
+    assert trampoline_sum(n) == loop_sum(n)
+    print(f"{'trampoline, n=' + str(n):<24}{bench(trampoline_sum, n, number=5):>10.1f} ns/call")
+
+
+if __name__ == '__main__':
+    main()
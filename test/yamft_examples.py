@@ -60,6 +60,22 @@ class Examples(unittest.TestCase):
         self.assertEqual({1: [2, 3, 5, 6], 10: [20, 30]}, map_values(lambda v: [e for f in v for e in f[1]],
                         group_by(fst, [(1, [2, 3]), (10, [20, 30]), (1, [5, 6])])))
 
+    def test3(self):
+        L = [
+            {'id': 1, 'date': '2019-02-28', 'val': 10.5},
+            {'id': 2, 'date': '2019-02-28', 'val': 12.7},
+            {'id': 1, 'date': '2019-03-01', 'val': 10.9},
+            {'id': 2, 'date': '2019-03-01', 'val': 12.1},
+            {'id': 2, 'date': '2019-03-02', 'val': 12.9},
+        ]
+        self.assertEqual({1: {'count': 2, 'min': 10.5, 'max': 10.9, 'first': '2019-02-28', 'last': '2019-03-01'},
+                          2: {'count': 3, 'min': 12.1, 'max': 12.9, 'first': '2019-02-28', 'last': '2019-03-02'}},
+                         group_agg(dget('id'), L, count=True, min=dget('val'), max=dget('val'),
+                                   first=dget('date'), last=dget('date')))
+        self.assertEqual(map_values(len, group_by(dget('id'), L)),
+                         map_values(dget('count'), group_agg(dget('id'), L, count=True)))
+        self.assertEqual({}, group_agg(dget('id'), [], sum=dget('val')))
+
 
 if __name__ == '__main__':
     unittest.main()
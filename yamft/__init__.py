@@ -18,11 +18,15 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import operator
-import functools
+import reprlib
+import warnings
 
 
 def yamft_wraps(qualname, doc):
-    """A YAMFT version of functools @wraps"""
+    """A YAMFT version of functools @wraps. Deprecated: the combinators
+    compute their own names and docs."""
+    warnings.warn("yamft_wraps is deprecated", DeprecationWarning, stacklevel=2)
+
     def real_wraps(func):
         func.__name__ = qualname
         func.__qualname__ = qualname
@@ -30,6 +34,96 @@ def yamft_wraps(qualname, doc):
         return func
     return real_wraps
 
+
+_short = reprlib.Repr()
+_short.maxstring = _short.maxother = 30
+_short.maxlist = _short.maxtuple = _short.maxset = _short.maxfrozenset = _short.maxdict = 4
+_short_repr = _short.repr
+
+# Set by a `yamft.instrument.Profiler` while it is active: a function
+# (pipeline, stages) -> instrumented stages, called when a pipeline is created.
+_instrument = None
+
+
+def _short_str(value):
+    if isinstance(value, str):
+        return value if len(value) <= _short.maxstring else value[:_short.maxstring - 3] + '...'
+    return _short_repr(value)
+
+
+class _CombinatorDoc:
+    """The `__doc__` of a combinator class: the docstring for the class, and
+    a docstring computed on demand for the instances"""
+    def __init__(self, doc):
+        self.doc = doc
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.doc
+        return instance._instance_doc()
+
+
+class Combinator:
+    """Base class of the YAMFT combinators: small callable objects that can
+    be pickled (e.g. to be sent to a `multiprocessing` worker), as long as
+    their arguments can be pickled.
+
+    A subclass lists the arguments of its constructor in `_fields`, or
+    overrides `_args`. The `__name__` and the `__doc__` of an instance are
+    computed on demand, from the truncated reprs of the arguments: the
+    `__doc__` is given by the `_doc` template, if any.
+
+    >>> from yamft import add1
+    >>> add1(2).__name__, add1(2).__doc__
+    ('add_2', 'Same as a + 2.')
+    >>> add1(list(range(1000))).__doc__
+    'Same as a + [0, 1, 2, 3, ...].'
+    >>> add1.__doc__
+    'Return a function a -> (a + b).'
+    >>> dot(*[abs] * 10).__doc__
+    'Same as <built-in function abs>.<built-in function abs>.<built-in function abs>.<built-in function abs>....'
+    """
+    __slots__ = ()
+    _fields = ()
+    _doc = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.__doc__ = _CombinatorDoc(cls.__dict__.get('__doc__'))
+
+    def _instance_doc(self):
+        """Return the docstring of the instance"""
+        if self._doc is None:
+            return type(self).__doc__
+        return self._doc.format(**{field: _short_repr(getattr(self, field))
+                                   for field in self._fields})
+
+    def _args(self):
+        """Return the positional arguments of the constructor"""
+        return tuple(getattr(self, field) for field in self._fields)
+
+    def _key(self):
+        """Return the structural key of the combinator, for == and hash"""
+        return type(self), self._args()
+
+    def __eq__(self, other):
+        if not isinstance(other, Combinator):
+            return NotImplemented
+        return self is other or self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __reduce__(self):
+        return type(self), self._args()
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, ", ".join(map(repr, self._args())))
+
+    @property
+    def __name__(self):
+        return "_".join([type(self).__name__.rstrip('1'), *map(_short_str, self._args())])
+
 # Base bricks:
 #
 # * star and unstar to unpack/pack the arguments
@@ -37,17 +131,24 @@ def yamft_wraps(qualname, doc):
 # * maybe is a singleton or an empty tuple
 
 
-def unstar(func):
+class unstar(Combinator):
     """Packs the positional arguments into sequence/collection
 
     >>> unstar(sum)(1,2,3)
     6
 
     """
-    return lambda *args: func(args)
+    __slots__ = ('func',)
+    _fields = ('func',)
 
+    def __init__(self, func):
+        self.func = func
 
-def star(func):
+    def __call__(self, *args):
+        return self.func(args)
+
+
+class star(Combinator):
     """Unpacks the sequence/collection into positional arguments
 
     >>> import math
@@ -55,10 +156,17 @@ def star(func):
     256.0
 
     """
-    return lambda args: func(*args)
+    __slots__ = ('func',)
+    _fields = ('func',)
+
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, args):
+        return self.func(*args)
 
 
-def either(func, *excs):
+class either(Combinator):
     """
 
     >>> either(int, ValueError)(1)
@@ -69,19 +177,24 @@ def either(func, *excs):
     [1, 0, 2, 0, 3, 0]
 
     """
-    if excs:
-        exc = tuple(excs)
-    else:
-        exc = Exception
-
-    @yamft_wraps(f"either_{func}", f"""Return ({func}(args), None) if there is 
-    no exception, else (None, exception)")""")
-    def wrapped(*args, **kwargs):
+    __slots__ = ('func', 'excs', '_exc', '_func')
+    _fields = ('func',)
+    _doc = "Return ({func}(args), None) if there is no exception, else (None, exception)"
+
+    def __init__(self, func, *excs):
+        self.func = func
+        self.excs = excs
+        self._exc = excs if excs else Exception
+        self._func = func if _instrument is None else _instrument(self, (func,))[0]
+
+    def _args(self):
+        return (self.func, *self.excs)
+
+    def __call__(self, *args, **kwargs):
         try:
-            return func(*args, **kwargs), None
-        except exc as e:
+            return self._func(*args, **kwargs), None
+        except self._exc as e:
             return None, e
-    return wrapped
 
 
 def left(either_value, default):
@@ -122,7 +235,7 @@ fth = operator.itemgetter(3)
 # The MISC section
 
 
-def flip(func):
+class flip(Combinator):
     """Flip the two first arguments of a function
 
     >>> import operator
@@ -133,11 +246,14 @@ def flip(func):
     >>> sub_1(10)
     9
     """
+    __slots__ = ('func',)
+    _fields = ('func',)
 
-    def wrapped(b, a, *args, **kwargs):
-        return func(a, b, *args, **kwargs)
+    def __init__(self, func):
+        self.func = func
 
-    return wrapped
+    def __call__(self, b, a, *args, **kwargs):
+        return self.func(a, b, *args, **kwargs)
 
 
 def even(v):
@@ -191,7 +307,7 @@ def coalesce(*values):
     >>> coalesce("", "a")
     'a'
     """
-    return next((v for v in values if v), None)
+    return next(filter(None, values), None)
 
 
 def find_first(func, *values):
@@ -206,23 +322,88 @@ def find_first(func, *values):
     >>> find_first(odd, *range(10))
     1
     """
-    return next((v for v in values if func(v)), None)
+    return next(filter(func, values), None)
 
 
 def coalesce_none(*values):
-    """Return the first True value in values or None
+    """Return the first value in values that is not None, or None
 
-    >>> coalesce() is None
+    >>> coalesce_none() is None
     True
-    >>> coalesce("a")
-    'a'
-    >>> coalesce("", "a")
+    >>> coalesce_none(None, "a")
     'a'
+    >>> coalesce_none("", "a")
+    ''
     """
     return next((v for v in values if v is not None), None)
 
 
-def partial_r(func, *p_args, **p_kwargs):
+def coalesce_iter(iterable):
+    """Same as `coalesce(*iterable)`, but the iterable is consumed up to the
+    first True value only
+
+    >>> from itertools import count
+    >>> coalesce_iter(count())
+    1
+    >>> coalesce_iter([]) is None
+    True
+    """
+    return next(filter(None, iterable), None)
+
+
+def find_first_iter(func, iterable):
+    """Same as `find_first(func, *iterable)`, but the iterable is consumed up
+    to the first match only
+
+    >>> from itertools import count
+    >>> find_first_iter(lambda x: x * x > 50, count())
+    8
+    """
+    return next(filter(func, iterable), None)
+
+
+def coalesce_none_iter(iterable):
+    """Same as `coalesce_none(*iterable)`, but the iterable is consumed up to
+    the first value that is not None only
+
+    >>> coalesce_none_iter(iter([None, 0, 1]))
+    0
+    """
+    return next((v for v in iterable if v is not None), None)
+
+
+def lazy_coalesce(*thunks):
+    """Same as `coalesce`, but the values are given as functions without
+    arguments, that are called one at a time, up to the first True value
+
+    >>> lazy_coalesce(lambda: "", lambda: "a", lambda: 1 / 0)
+    'a'
+    """
+    return coalesce_iter(thunk() for thunk in thunks)
+
+
+def lazy_find_first(func, *thunks):
+    """Same as `find_first`, but the values are given as functions without
+    arguments, that are called one at a time, up to the first match
+
+    >>> lazy_find_first(odd, lambda: 2, lambda: 3, lambda: 1 / 0)
+    3
+    """
+    return find_first_iter(func, (thunk() for thunk in thunks))
+
+
+def lazy_coalesce_none(*thunks):
+    """Same as `coalesce_none`, but the values are given as functions without
+    arguments, that are called one at a time, up to the first value that is
+    not None
+
+    >>> lazy_coalesce_none(lambda: None, lambda: 0, lambda: 1 / 0)
+    0
+    """
+    return coalesce_none_iter(thunk() for thunk in thunks)
+
+
+class partial_r(Combinator):
     """Simplified version of fuctools.partial for rightmost arguments
 
     >>> import operator
@@ -230,16 +411,37 @@ def partial_r(func, *p_args, **p_kwargs):
     9
     >>> list(map(partial_r(operator.pow, 2), range(1, 11)))
     [1, 4, 9, 16, 25, 36, 49, 64, 81, 100]
+    >>> partial_r(int, base=2)("101")
+    5
     """
+    __slots__ = ('func', 'args', 'kwargs')
+
+    def __init__(self, func, *p_args, **p_kwargs):
+        self.func = func
+        self.args = p_args
+        self.kwargs = p_kwargs
 
-    def wrapped(*args, **kwargs):
-        new_kwargs = {**p_kwargs, **kwargs}
-        return func(*args, *p_args, **new_kwargs)
+    def _args(self):
+        return (self.func, *self.args)
 
-    return wrapped
+    def _key(self):
+        return type(self), self._args(), tuple(sorted(self.kwargs.items()))
 
+    def __reduce__(self):
+        return type(self), self._args(), self.kwargs
 
-def dot(*funcs):
+    def __setstate__(self, state):
+        self.kwargs = state
+
+    def __call__(self, *args, **kwargs):
+        if kwargs:
+            kwargs = {**self.kwargs, **kwargs}
+        else:
+            kwargs = self.kwargs
+        return self.func(*args, *self.args, **kwargs)
+
+
+class dot(Combinator):
     """Function must be starred in order to pass one argument.
 
     >>> from yamft.operator import add1, pow1
@@ -259,21 +461,40 @@ def dot(*funcs):
     2.5
 
     """
-    @yamft_wraps(f"dot_{funcs}", "Same as {}".format(".".join(map(str, funcs))))
-    def wrapped(*args, **kwargs):
-        it = reversed(funcs)
-        try:
-            first_func = next(it)
-            ret = first_func(*args, **kwargs)
-            for func in it:
-                ret = func(ret, **kwargs)
-        except StopIteration:
-            ret = args
+    __slots__ = ('funcs', '_last', '_others')
+    _doc = "Same as {}"
+
+    def __init__(self, *funcs):
+        self.funcs = funcs
+        if _instrument is not None and funcs:
+            funcs = _instrument(self, funcs)
+        # the last function is applied first
+        self._last = funcs[-1] if funcs else None
+        self._others = funcs[-2::-1]
+
+    def _args(self):
+        return self.funcs
+
+    def _instance_doc(self):
+        funcs = [*map(_short_str, self.funcs[:_short.maxtuple])]
+        if len(self.funcs) > _short.maxtuple:
+            funcs.append('...')
+        return self._doc.format(".".join(funcs))
+
+    def __call__(self, *args, **kwargs):
+        if self._last is None:
+            return args
+        ret = self._last(*args, **kwargs)
+        for func in self._others:
+            ret = func(ret, **kwargs)
         return ret
-    return wrapped
 
 
 from yamft.operator import *
 from yamft.comprehension import *
 from yamft.incubator import *
-from yamft.map_fold import *
\ No newline at end of file
+from yamft.map_fold import *
+from yamft.sketch import *
+from yamft.instrument import *
+from yamft.parallel import *
+from yamft.records import *
\ No newline at end of file
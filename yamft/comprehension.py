@@ -30,43 +30,51 @@ class Box:
     [2, 4, 16, 256, 65536]
     >>> b.get()[0]
     4294967296
+
+    `get`, `set` and `apply` return the same one element list on every call,
+    to avoid an allocation per step: iterate over it at once (as in a
+    comprehension), but don't keep it.
     """
+    __slots__ = ('_value', '_out')
+
     def __init__(self, value=None):
-        if value is not None:
-            self._value = value
+        self._value = value
+        self._out = [None]
 
     def set(self, value):
-        prev = self._value
+        out = self._out
+        out[0] = self._value
         self._value = value
-        return prev,
+        return out
 
     def get(self):
-        return self._value,
+        out = self._out
+        out[0] = self._value
+        return out
 
     def apply(self, func):
-        prev = self._value
+        out = self._out
+        out[0] = self._value
         self._value = func(self._value)
-        return prev,
+        return out
+
 
 class BoxB:
     """
     """
+    __slots__ = ('_next', '_buf')
+
     def __init__(self, value):
-        if value is not None:
-            self._next = value
-            self._buf = [None]
-        else:
-            self._buf = [None]
+        self._next = value
+        self._buf = [None]
 
     def set(self, value):
-        print("set", value, self._buf)
         self._next = value
         self._buf.append(value)
         return True
 
     def get(self):
         while self._next is not None:
-            print("get", self._next, self._buf)
             yield self._next
             # optional set call goes here
             self._next = self._buf.pop()
@@ -79,6 +87,130 @@ class BoxB:
             if test is not None and not test(value):
                 self._next = None
 
+
+_EMPTY = object()
+
+
+class Window:
+    """A sliding window of the last `size` values, stored in a ring buffer.
+
+    `push(value)` adds a value and returns a one element list containing
+    the window if the window is full (or if `partial` is True), else an
+    empty tuple.
+
+    >>> w = Window(3)
+    >>> [sum(win) for x in range(6) for win in w.push(x)]
+    [3, 6, 9, 12]
+    >>> list(w), w[0], w[-1], w.evicted
+    ([3, 4, 5], 3, 5, 2)
+
+    >>> w = Window(2, partial=True)
+    >>> [list(win) for x in "abc" for win in w.push(x)]
+    [['a'], ['a', 'b'], ['b', 'c']]
+    """
+    __slots__ = ('size', 'partial', 'evicted', '_buf', '_start', '_len', '_out')
+
+    def __init__(self, size, partial=False):
+        if size < 1:
+            raise ValueError("size must be at least 1")
+        self.size = size
+        self.partial = partial
+        self.evicted = None
+        self._buf = [None] * size
+        self._start = 0
+        self._len = 0
+        self._out = [self]
+
+    def push(self, value):
+        if self._len < self.size:
+            self._buf[self._len] = value
+            self._len += 1
+            if self._len < self.size and not self.partial:
+                return ()
+        else:
+            start = self._start
+            self.evicted = self._buf[start]
+            self._buf[start] = value
+            self._start = (start + 1) % self.size
+        return self._out
+
+    def __len__(self):
+        return self._len
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError('window index out of range')
+        return self._buf[(self._start + i) % self.size]
+
+    def __iter__(self):
+        buf, start, n = self._buf, self._start, self._len
+        if start:
+            yield from buf[start:]
+            yield from buf[:start]
+        else:
+            yield from buf[:n]
+
+
+class Scan:
+    """A running accumulator: `push(value)` sets `acc = func(acc, value)` and
+    returns a one element list containing `acc`. Without an `initial` value,
+    the first value is the first accumulator.
+
+    >>> import operator
+    >>> s = Scan(operator.add)
+    >>> [acc for x in range(1, 6) for acc in s.push(x)]
+    [1, 3, 6, 10, 15]
+    >>> s = Scan(max, 3)
+    >>> [acc for x in [1, 5, 2, 7] for acc in s.push(x)]
+    [3, 5, 5, 7]
+    """
+    __slots__ = ('func', 'acc', '_out')
+
+    def __init__(self, func, initial=_EMPTY):
+        self.func = func
+        self.acc = initial
+        self._out = [None]
+
+    def push(self, value):
+        if self.acc is _EMPTY:
+            self.acc = value
+        else:
+            self.acc = self.func(self.acc, value)
+        out = self._out
+        out[0] = self.acc
+        return out
+
+
+class Prev:
+    """Track the previous value: `push(value)` returns a one element list
+    containing the previous value, or an empty tuple on the first value
+    if there is no `initial` value.
+
+    >>> p = Prev()
+    >>> [x - prev for x in [1, 4, 9, 16] for prev in p.push(x)]
+    [3, 5, 7]
+    >>> p = Prev(0)
+    >>> [x - prev for x in [1, 4, 9, 16] for prev in p.push(x)]
+    [1, 3, 5, 7]
+    """
+    __slots__ = ('_value', '_out')
+
+    def __init__(self, initial=_EMPTY):
+        self._value = initial
+        self._out = [None]
+
+    def push(self, value):
+        prev = self._value
+        self._value = value
+        if prev is _EMPTY:
+            return ()
+        out = self._out
+        out[0] = prev
+        return out
+
+
 def try_or(try_func, *args, **kwargs):
     """
 
@@ -48,7 +48,7 @@ def yamft_help(func):
     global _my_globals
     try:
         name = _my_globals[func]
-        help_func = globals().get("_help_"+name)
+        help_func = globals()["_help_"+name]
     except KeyError:
         help(func)
     else:
@@ -111,17 +111,6 @@ def _help_filter0():
     pass
 
 
-def _help_sorted_k():
-    """Sort values by key.
-    Input and output: tuples (value, key)
-
-    >>> from operator import neg
-    >>> list(sorted_k(map_k(neg, range(5))))
-    [(4, -4), (3, -3), (2, -2), (1, -1), (0, 0)]
-    """
-    pass
-
-
 def _help_collect():
     """Remove the key
 
@@ -16,12 +16,19 @@
 #
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import heapq as _heapq
+import inspect as _inspect
+import operator as _operator
+import pickle as _pickle
+import tempfile as _tempfile
+from array import array as _array
 from functools import partial
-from itertools import tee
-from yamft import fst, snd, dot
+from itertools import tee, islice as _islice, compress as _compress
+import yamft as _yamft
+from yamft import fst, snd, dot, ident, Combinator
 
 
-def curry(func):
+class curry(Combinator):
     """Curry a function
 
     >>> import operator
@@ -34,24 +41,98 @@ def curry(func):
     >>> list(map(list, apply_all(map(curry(operator.mul), range(1,4)), range(1,4))))
     [[1, 2, 3], [2, 4, 6], [3, 6, 9]]
     """
-    def wrapped(a):
-        return partial(func, a)
+    __slots__ = ('func',)
+    _fields = ('func',)
 
-    return wrapped
+    def __init__(self, func):
+        self.func = func
 
+    def __call__(self, a):
+        return partial(self.func, a)
 
-def unlazy(func):
+
+def _arity(func):
+    """Return the number of positional parameters without default value"""
+    return sum(1 for p in _inspect.signature(func).parameters.values()
+               if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)
+               and p.default is p.empty)
+
+
+class autocurry(Combinator):
+    """Curry a function on all its positional parameters without default
+    value. The arguments may be given in any grouping, and the function is
+    called directly once all of them are known. The arity is read once from
+    the signature, or given by `arity` (e.g. for builtins without signature).
+
+    >>> @autocurry
+    ... def f(a, b, c):
+    ...     return a + b * c
+    >>> f(1)(2)(3), f(1, 2)(3), f(1)(2, 3), f(1, 2, 3)
+    (7, 7, 7, 7)
+    >>> f(1)
+    autocurry(<function f at ...>, 3, (1,), {})
+
+    Keyword arguments are passed along, but don't count:
+
+    >>> def scale(a, b, factor=1):
+    ...     return (a + b) * factor
+    >>> autocurry(scale)(1)(2, factor=10)
+    30
+    >>> autocurry(int, arity=1)("101", base=2)
+    5
+    >>> import operator
+    >>> list(map(autocurry(operator.pow)(2), range(5)))
+    [1, 2, 4, 8, 16]
+    """
+    __slots__ = ('func', 'arity', 'args', 'kwargs')
+
+    def __init__(self, func, arity=None, args=(), kwargs=None):
+        self.func = func
+        self.arity = _arity(func) if arity is None else arity
+        self.args = args
+        self.kwargs = {} if kwargs is None else kwargs
+
+    def _args(self):
+        return self.func, self.arity, self.args, self.kwargs
+
+    def _key(self):
+        return type(self), self.func, self.arity, self.args, tuple(sorted(self.kwargs.items()))
+
+    def __call__(self, *args, **kwargs):
+        if self.args:
+            args = self.args + args
+        if self.kwargs:
+            kwargs = {**self.kwargs, **kwargs}
+        if len(args) >= self.arity:
+            return self.func(*args, **kwargs)
+
+        # skip __init__: the arity is already known
+        curried = object.__new__(autocurry)
+        curried.func = self.func
+        curried.arity = self.arity
+        curried.args = args
+        curried.kwargs = kwargs
+        return curried
+
+
+class unlazy(Combinator):
     """
 
     >>> unlazy(lambda x, y: x + y())(1, 2)
     3
+    >>> unlazy(lambda x, y, z: x + y() + z())(1, 2, 3)
+    6
 
     """
-    def wrapped(*args, **kwargs):
-        args = tuple([args[0]] + [lambda: arg for arg in args[1:]])
-        return func(*args, **kwargs)
+    __slots__ = ('func',)
+    _fields = ('func',)
 
-    return wrapped
+    def __init__(self, func):
+        self.func = func
+
+    def __call__(self, *args, **kwargs):
+        args = tuple([args[0]] + [lambda arg=arg: arg for arg in args[1:]])
+        return self.func(*args, **kwargs)
 
 
 def once(ret, *_args):
@@ -102,10 +183,156 @@ def map_k(func, iterable):
     return map(lambda v: (v, func(v)), iterable)
 
 
-sorted_k = partial(sorted, key=snd)
+def sorted_k(iterable, reverse=False, run_size=None):
+    """Sort values by key.
+    Input and output: tuples (value, key)
+
+    >>> from operator import neg
+    >>> list(sorted_k(map_k(neg, range(5))))
+    [(4, -4), (3, -3), (2, -2), (1, -1), (0, 0)]
+
+    If `run_size` is set, the tuples are sorted by runs of `run_size` tuples
+    that are spilled to temporary files, and the runs are merged lazily: the
+    result is an iterator and only one run is held in memory at a time. At
+    most 64 runs are merged at once (the runs are merged by levels, into new
+    temporary files), hence the number of open files stays bounded.
+
+    >>> it = sorted_k(map_k(neg, range(5)), run_size=2)
+    >>> list(collect(it))
+    [4, 3, 2, 1, 0]
+    """
+    if run_size is None:
+        return sorted(iterable, key=snd, reverse=reverse)
+    if run_size < 1:
+        raise ValueError("run_size must be at least 1")
+    return _external_sorted_k(iterable, reverse, run_size)
+
+
+_SPILL_CHUNK = 1024
+# The maximum number of runs merged at once, hence of spill files open
+_MAX_FAN_IN = 64
+
+
+def _spill(run):
+    f = _tempfile.TemporaryFile()
+    try:
+        for chunk in iter(lambda: list(_islice(run, _SPILL_CHUNK)), []):
+            _pickle.dump(chunk, f, _pickle.HIGHEST_PROTOCOL)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
+
+
+def _read_run(f):
+    while True:
+        try:
+            chunk = _pickle.load(f)
+        except EOFError:
+            return
+        yield from chunk
+
+
+def _merge_runs(files, reverse):
+    """Merge the runs of the files, in this order, into a new run, and close
+    the files"""
+    try:
+        return _spill(_heapq.merge(*map(_read_run, files), key=snd, reverse=reverse))
+    finally:
+        for f in files:
+            f.close()
+
+
+def _external_sorted_k(iterable, reverse, run_size):
+    it = iter(iterable)
+    # levels[i] holds the runs made of _MAX_FAN_IN ** i initial runs, at
+    # most _MAX_FAN_IN - 1 per level: the runs of a level are older than
+    # the runs of the levels below, and a merge keeps the ties in order
+    levels = [[]]
+    try:
+        while True:
+            run = list(_islice(it, run_size))
+            if len(run) < run_size and not levels[0] and len(levels) == 1:
+                yield from sorted(run, key=snd, reverse=reverse)
+                return
+            if not run:
+                break
+            run.sort(key=snd, reverse=reverse)
+            f = _spill(iter(run))
+            del run
+            level = 0
+            while True:
+                levels[level].append(f)
+                if len(levels[level]) < _MAX_FAN_IN:
+                    break
+                files, levels[level] = levels[level], []
+                f = _merge_runs(files, reverse)
+                level += 1
+                if level == len(levels):
+                    levels.append([])
+        files = [f for level in reversed(levels) for f in level]
+        levels = [files]
+        while len(files) > _MAX_FAN_IN:
+            files[:_MAX_FAN_IN] = [_merge_runs(files[:_MAX_FAN_IN], reverse)]
+        yield from _heapq.merge(*map(_read_run, files), key=snd, reverse=reverse)
+    finally:
+        for level in levels:
+            for f in level:
+                f.close()
+
+
+def top_k_k(n, iterable, reverse=True):
+    """Return the `n` tuples with the greatest keys, in decreasing order. Only
+    `n` tuples are kept in memory.
+    Same as `sorted_k(iterable, reverse=reverse)[:n]`.
+    Input and output: tuples (value, key)
+
+    >>> from operator import neg
+    >>> top_k_k(2, map_k(neg, range(5)))
+    [(0, 0), (1, -1)]
+    >>> list(collect(top_k_k(2, map_k(neg, range(5)), reverse=False)))
+    [4, 3]
+    """
+    if reverse:
+        return _heapq.nlargest(n, iterable, key=snd)
+    else:
+        return _heapq.nsmallest(n, iterable, key=snd)
+
+
 collect = partial(map, fst)
 
 
+def sorted_by_k(func, iterable, pred=None, reverse=False, typecode=None):
+    """Sort the values by key `func(v)`, keeping only the values whose key
+    matches `pred` (if not None). Same as
+    `collect(sorted_k(filter_k(pred, map_k(func, iterable)), reverse=reverse))`,
+    but no `(value, key)` tuple is built: keys are stored in a list parallel to
+    the values (or in an `array.array` of the given `typecode`, e.g. `'d'` for
+    float keys), and a permutation of the indices is sorted.
+
+    >>> from operator import neg
+    >>> list(sorted_by_k(neg, range(5)))
+    [4, 3, 2, 1, 0]
+    >>> from yamft import even, le1
+    >>> list(sorted_by_k(neg, range(5), even))
+    [4, 2, 0]
+
+    >>> rows = ['1.4 2.5 5.6', '2.4 7.5 9.8', '4.8 9.7 2.5', '4.5 6.5 7.9']
+    >>> list(sorted_by_k(dot(float, snd, str.split), rows, le1(8), typecode='d'))
+    ['1.4 2.5 5.6', '4.5 6.5 7.9', '2.4 7.5 9.8']
+    """
+    values = iterable if isinstance(iterable, (list, tuple)) else list(iterable)
+    if typecode is None:
+        keys = list(map(func, values))
+    else:
+        keys = _array(typecode, map(func, values))
+    indices = range(len(values))
+    if pred is not None:
+        indices = _compress(indices, map(pred, keys))
+    return map(values.__getitem__, sorted(indices, key=keys.__getitem__, reverse=reverse))
+
+
 def filter_k(func, iterable):
     """
     Input and output: tuples (value, key)
@@ -137,6 +364,8 @@ def filter_map(func, iterable):
     >>> list(filter_map(either(float, ValueError), ["1","a","3","4"]))
     [1.0, 3.0, 4.0]
     """
+    if _yamft._instrument is not None and not isinstance(func, _yamft.either):
+        func, = _yamft._instrument(filter_map, (func,))
     return map(fst, filter(lambda e: snd(e) is None, map(func, iterable)))
 
 
@@ -163,6 +392,130 @@ def group_by(key, iterable):
     return groups
 
 
+def _mean_start(v):
+    return [v, 1]
+
+
+def _mean_step(acc, v):
+    acc[0] += v
+    acc[1] += 1
+    return acc
+
+
+def _mean_finish(acc):
+    return acc[0] / acc[1]
+
+
+def _count_start(_v):
+    return 1
+
+
+def _count_step(acc, _v):
+    return acc + 1
+
+
+def _first_step(acc, _v):
+    return acc
+
+
+def _last_step(_acc, v):
+    return v
+
+
+def _min_step(acc, v):
+    return v if v < acc else acc
+
+
+def _max_step(acc, v):
+    return v if v > acc else acc
+
+
+# name -> (start, step, finish): `start` builds the state from the first value,
+# `step` folds the next value into the state, `finish` returns the result.
+_AGGREGATES = {
+    'count': (_count_start, _count_step, ident),
+    'sum': (ident, _operator.add, ident),
+    'min': (ident, _min_step, ident),
+    'max': (ident, _max_step, ident),
+    'mean': (_mean_start, _mean_step, _mean_finish),
+    'first': (ident, _first_step, ident),
+    'last': (ident, _last_step, ident),
+}
+
+
+def _aggregate(name, spec):
+    """Return a (start, step, finish) triple that works on the raw elements"""
+    if isinstance(spec, tuple):
+        return spec
+
+    try:
+        start, step, finish = _AGGREGATES[name]
+    except KeyError:
+        raise TypeError(f"unknown aggregate '{name}'") from None
+
+    if spec is True:
+        return start, step, finish
+    return dot(start, spec), lambda acc, v: step(acc, spec(v)), finish
+
+
+def group_agg(key, iterable, **aggregates):
+    """Group elements by key and reduce every group on the fly. Only the
+    running state of every aggregate is kept, not the elements of the group.
+
+    Every keyword is an aggregate: `count`, `sum`, `min`, `max`, `mean`,
+    `first` or `last`. The value is a function that extracts the value to
+    aggregate from the element, or `True` to aggregate the element itself.
+    A custom aggregate is given as a `(start, step, finish)` triple.
+
+    >>> from yamft import mod1
+    >>> group_agg(mod1(2), range(10), count=True, sum=True)
+    {0: {'count': 5, 'sum': 20}, 1: {'count': 5, 'sum': 25}}
+
+    >>> from yamft import dget
+    >>> L = [{'id': 1, 'val': 10.5}, {'id': 2, 'val': 12.7},
+    ...      {'id': 1, 'val': 10.9}, {'id': 2, 'val': 12.1}]
+    >>> group_agg(dget('id'), L, max=dget('val'), last=dget('val'))
+    {1: {'max': 10.9, 'last': 10.9}, 2: {'max': 12.7, 'last': 12.1}}
+    >>> group_agg(dget('id'), L, mean=dget('val'), count=dget('val'))[1]
+    {'mean': 10.7, 'count': 2}
+
+    Same as `map_values(len, group_by(...))`, without the lists:
+
+    >>> group_agg(len, ["a", "bc", "de", "f"], count=True)
+    {1: {'count': 2}, 2: {'count': 2}}
+
+    A custom aggregate:
+
+    >>> import operator
+    >>> group_agg(mod1(3), range(10), prod=(ident, operator.mul, ident))
+    {0: {'prod': 0}, 1: {'prod': 28}, 2: {'prod': 80}}
+
+    >>> group_agg(mod1(2), range(10), median=True)
+    Traceback (most recent call last):
+    ...
+    TypeError: unknown aggregate 'median'
+    """
+    names = list(aggregates)
+    triples = [_aggregate(name, spec) for name, spec in aggregates.items()]
+    starts = [start for start, _, _ in triples]
+    steps = [step for _, step, _ in triples]
+    finishes = [finish for _, _, finish in triples]
+
+    states = {}
+    for element in iterable:
+        k = key(element)
+        state = states.get(k)
+        if state is None:
+            states[k] = [start(element) for start in starts]
+        else:
+            for i, step in enumerate(steps):
+                state[i] = step(state[i], element)
+
+    return {k: {name: finish(v)
+                for name, finish, v in zip(names, finishes, state)}
+            for k, state in states.items()}
+
+
 def merge(*dicts):
     """
 
@@ -176,6 +529,153 @@ def merge(*dicts):
     return merged
 
 
+_JOIN_MODES = {'inner': (False, False), 'left': (True, False), 'right': (False, True),
+               'outer': (True, True)}
+
+
+def _join_modes(how):
+    """Return (keep the unmatched left rows, keep the unmatched right rows)"""
+    try:
+        return _JOIN_MODES[how]
+    except KeyError:
+        raise ValueError("unknown join: {!r}".format(how)) from None
+
+
+def _join_outputs(tuples):
+    """Return the functions that build the output of a matched pair, of an
+    unmatched left row and of an unmatched right row"""
+    if tuples:
+        return (lambda l, r: (l, r)), (lambda l: (l, None)), (lambda r: (None, r))
+    return (lambda l, r: {**l, **r}), dict, dict
+
+
+def _hash_join(build, stream, key_b, key_s, keep_b, keep_s, both, only_b, only_s):
+    table = {}
+    for b in build:
+        k = key_b(b)
+        rows = table.get(k)
+        if rows is None:
+            table[k] = [b]
+        else:
+            rows.append(b)
+    matched = set() if keep_b else None
+    for s in stream:
+        k = key_s(s)
+        rows = table.get(k)
+        if rows is None:
+            if keep_s:
+                yield only_s(s)
+            continue
+        if matched is not None:
+            matched.add(k)
+        for b in rows:
+            yield both(b, s)
+    if keep_b:
+        for k, rows in table.items():
+            if k not in matched:
+                yield from map(only_b, rows)
+
+
+def hash_join(left, right, key_l, key_r=None, how='inner', tuples=False):
+    """Join the rows of left and right that have the same key (key_l(row) for
+    the left rows, key_r(row), default key_l, for the right rows). how is
+    `inner`, `left`, `right` or `outer`: the unmatched rows of the left, the
+    right or both sides are kept.
+
+    The rows are dicts, merged as `merge(l, r)`; if tuples is True, the
+    output is the pairs (l, r), with None for a missing side.
+
+    A hash table of the smaller side (the side that has a len, if only one
+    has a len, else the right side) is built, and the other side is
+    streamed: the output is lazy, in the order of the streamed side, followed
+    by the unmatched rows of the built side.
+
+    >>> from yamft import dget
+    >>> users = [{'id': 1, 'name': 'a'}, {'id': 2, 'name': 'b'}]
+    >>> orders = [{'user': 1, 'item': 'x'}, {'user': 3, 'item': 'y'}, {'user': 1, 'item': 'z'}]
+    >>> list(hash_join(users, orders, dget('id'), dget('user')))
+    [{'id': 1, 'name': 'a', 'user': 1, 'item': 'x'}, {'id': 1, 'name': 'a', 'user': 1, 'item': 'z'}]
+    >>> [(l and l['name'], r and r['item'])
+    ...  for l, r in hash_join(users, orders, dget('id'), dget('user'), 'outer', tuples=True)]
+    [('a', 'x'), (None, 'y'), ('a', 'z'), ('b', None)]
+    """
+    keep_l, keep_r = _join_modes(how)
+    key_r = key_l if key_r is None else key_r
+    both, only_l, only_r = _join_outputs(tuples)
+    try:
+        build_left = len(left) <= len(right)
+    except TypeError:
+        build_left = hasattr(left, '__len__') and not hasattr(right, '__len__')
+    if build_left:
+        return _hash_join(left, right, key_l, key_r, keep_l, keep_r, both, only_l, only_r)
+    return _hash_join(right, left, key_r, key_l, keep_r, keep_l,
+                      lambda r, l: both(l, r), only_r, only_l)
+
+
+def _sorted_keys(iterable, key, side):
+    """Yield the (key, row) of the rows, and check that the keys are sorted"""
+    previous = None
+    for i, row in enumerate(iterable):
+        k = key(row)
+        if i and k < previous:
+            raise ValueError("the {} rows are not sorted by key".format(side))
+        previous = k
+        yield k, row
+
+
+def merge_join(left, right, key_l, key_r=None, how='inner', tuples=False):
+    """Same as `hash_join`, for left and right sorted by key: the inputs are
+    read in one pass, and only the right rows of the current key are kept in
+    memory. The output is lazy and sorted by key. Raise a ValueError if a row
+    that is read is not sorted (an inner join stops reading when one side is
+    exhausted).
+
+    >>> from yamft import dget
+    >>> left = [{'k': 1, 'a': 1}, {'k': 2, 'a': 2}, {'k': 2, 'a': 3}]
+    >>> right = iter([{'k': 2, 'b': 4}, {'k': 5, 'b': 5}])
+    >>> list(merge_join(left, right, dget('k'), how='outer'))
+    [{'k': 1, 'a': 1}, {'k': 2, 'a': 2, 'b': 4}, {'k': 2, 'a': 3, 'b': 4}, {'k': 5, 'b': 5}]
+    """
+    keep_l, keep_r = _join_modes(how)
+    key_r = key_l if key_r is None else key_r
+    return _merge_join(_sorted_keys(left, key_l, 'left'), _sorted_keys(right, key_r, 'right'),
+                       keep_l, keep_r, *_join_outputs(tuples))
+
+
+def _merge_join(lefts, rights, keep_l, keep_r, both, only_l, only_r):
+    l = next(lefts, None)
+    r = next(rights, None)
+    while l is not None and r is not None:
+        (kl, lrow), (kr, rrow) = l, r
+        if kl < kr:
+            if keep_l:
+                yield only_l(lrow)
+            l = next(lefts, None)
+        elif kr < kl:
+            if keep_r:
+                yield only_r(rrow)
+            r = next(rights, None)
+        else:
+            group = [rrow]
+            r = next(rights, None)
+            while r is not None and r[0] == kl:
+                group.append(r[1])
+                r = next(rights, None)
+            while l is not None and l[0] == kr:
+                lrow = l[1]
+                for rrow in group:
+                    yield both(lrow, rrow)
+                l = next(lefts, None)
+    if keep_l:
+        while l is not None:
+            yield only_l(l[1])
+            l = next(lefts, None)
+    if keep_r:
+        while r is not None:
+            yield only_r(r[1])
+            r = next(rights, None)
+
+
 def auto_zip(iterable, *funcs):
     """
 
@@ -0,0 +1,355 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Per-stage profiling of the pipelines.
+
+While a `Profiler` is active, the stages of the `dot`, `map_dot`, `either` and
+`filter_map` pipelines *created* in the block are wrapped, and every stage
+records its number of calls, its cumulative and self times, and the number of
+exceptions it raised. Outside of a profiler, the combinators hold the plain
+functions: there is no wrapper and no flag checked per call.
+
+    >>> from yamft import dot
+    >>> with profile() as prof:
+    ...     to_int = dot(round, float, str.strip)
+    ...     values = [to_int(s) for s in [' 2.7 ', ' 3 ']]
+    >>> values
+    [3, 3]
+    >>> report = prof.report()
+    >>> report[0]['pipeline']
+    'dot(round, float, str.strip)'
+    >>> [(r['stage'], r['func'], r['calls']) for r in report]
+    [(0, 'round', 2), (1, 'float', 2), (2, 'str.strip', 2)]
+
+The stages are numbered as they are written (the last stage of a `dot` is
+applied first). A stage that returns a lazy iterator (e.g. a `map`) is only
+timed while it builds the iterator.
+
+Setting the environment variable `YAMFT_PROFILE` before yamft is imported
+starts a global profiler. If the value is a path (not `1`), the JSON report
+is written to this path at exit.
+
+`trace_allocations` is the memory counterpart: it attributes the memory
+allocated in a block to the yamft functions, with `tracemalloc`.
+"""
+
+__all__ = ['Profiler', 'profile', 'AllocationTracker', 'trace_allocations']
+
+import ast
+import atexit
+import json
+import os
+import threading
+import tracemalloc
+from bisect import bisect_right
+from functools import lru_cache
+from time import perf_counter
+
+import yamft
+from yamft import Combinator, _short_repr, _short_str
+
+_local = threading.local()
+
+
+def _stack():
+    """Return the stack of the child times of the running stages of the
+    current thread"""
+    try:
+        return _local.stack
+    except AttributeError:
+        _local.stack = []
+        return _local.stack
+
+
+def _label(func):
+    """Return a readable name for the function, without any address:
+    `dot(float, str.strip)` rather than `<class 'float'>`"""
+    if isinstance(func, Combinator):
+        return "{}({})".format(type(func).__name__, ", ".join(
+            _label(arg) if callable(arg) else _short_repr(arg) for arg in func._args()))
+    name = getattr(func, '__qualname__', None) or getattr(func, '__name__', None)
+    return name if isinstance(name, str) else _short_str(func)
+
+
+class _StageStats:
+    __slots__ = ('calls', 'cumulative', 'self_time', 'exceptions')
+
+    def __init__(self):
+        self.calls = 0
+        self.cumulative = 0.0
+        self.self_time = 0.0
+        self.exceptions = 0
+
+
+class _Stage:
+    """A stage of an instrumented pipeline"""
+    __slots__ = ('func', 'stats')
+
+    def __init__(self, func, stats):
+        self.func = func
+        self.stats = stats
+
+    def __call__(self, *args, **kwargs):
+        stack = _stack()
+        stack.append(0.0)
+        start = perf_counter()
+        try:
+            return self.func(*args, **kwargs)
+        except BaseException:
+            self.stats.exceptions += 1
+            raise
+        finally:
+            elapsed = perf_counter() - start
+            stats = self.stats
+            stats.calls += 1
+            stats.cumulative += elapsed
+            stats.self_time += elapsed - stack.pop()
+            if stack:
+                stack[-1] += elapsed
+
+
+class Profiler:
+    """A per-stage profiler. The statistics of the stages of the pipelines
+    that have the same name are merged. The counters are not locked: they are
+    exact in one thread, approximate when a pipeline is shared by threads.
+
+    >>> from yamft import either
+    >>> with Profiler() as prof:
+    ...     parse = either(int, ValueError)
+    ...     parsed = [parse(s) for s in "1a2"]
+    >>> [(r['pipeline'], r['calls'], r['exceptions']) for r in prof.report()]
+    [('either(int, ValueError)', 3, 1)]
+    """
+    def __init__(self):
+        self._stats = {}
+        self._previous = []
+
+    def _instrument(self, pipeline, funcs):
+        """Return the stages funcs of pipeline, wrapped"""
+        if isinstance(pipeline, Combinator):
+            name = _label(pipeline)
+        else:
+            name = "{}({})".format(_label(pipeline), ", ".join(map(_label, funcs)))
+        stages = []
+        for i, func in enumerate(funcs):
+            stats = self._stats.setdefault((name, i, _label(func)), _StageStats())
+            stages.append(_Stage(func, stats))
+        return stages
+
+    def __enter__(self):
+        self._previous.append(yamft._instrument)
+        yamft._instrument = self._instrument
+        return self
+
+    def __exit__(self, *exc_info):
+        yamft._instrument = self._previous.pop()
+
+    def report(self):
+        """Return one dict per stage, in the order of creation of the
+        pipelines. Times are in seconds."""
+        return [{'pipeline': pipeline, 'stage': i, 'func': func,
+                 'calls': stats.calls, 'cumulative': stats.cumulative,
+                 'self': stats.self_time, 'exceptions': stats.exceptions}
+                for (pipeline, i, func), stats in self._stats.items()]
+
+    def to_json(self, path=None, **kwargs):
+        """Return the report as a JSON string, or write it to path"""
+        if path is None:
+            return json.dumps(self.report(), **kwargs)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, **kwargs)
+
+    def reset(self):
+        """Reset the counters: the existing pipelines keep recording"""
+        for stats in self._stats.values():
+            stats.__init__()
+
+
+def profile():
+    """Return a new `Profiler`, to use in a `with` statement"""
+    return Profiler()
+
+
+_YAMFT_DIR = os.path.dirname(os.path.abspath(yamft.__file__))
+
+
+def _last_line(node):
+    """Return the last line of the node. Before Python 3.8, there is no
+    `end_lineno`: the last line of a statement that spans several lines is
+    the first line of its last sub-node."""
+    last = getattr(node, 'end_lineno', None)
+    if last is not None:
+        return last
+    return max(getattr(child, 'lineno', 0) for child in ast.walk(node))
+
+
+@lru_cache(maxsize=None)
+def _functions(filename):
+    """Return the sorted (first line, last line, qualname) of the functions
+    of a yamft module"""
+    with open(filename, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename)
+    functions = []
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                qualname = prefix + child.name
+                if not isinstance(child, ast.ClassDef):
+                    functions.append((child.lineno, _last_line(child), qualname))
+                visit(child, qualname + ".")
+
+    visit(tree, "")
+    return sorted(functions)
+
+
+def _function_at(filename, lineno):
+    """Return the qualname of the innermost function of a yamft module that
+    contains the line"""
+    module = os.path.splitext(os.path.relpath(filename, _YAMFT_DIR))[0]
+    module = 'yamft' if module == '__init__' else 'yamft.' + module.replace(os.sep, '.')
+    functions = _functions(filename)
+    name = '<module>'
+    # the candidates start before the line: the last one that contains the
+    # line is the innermost
+    for first, last, qualname in functions[:bisect_right(functions, (lineno, float('inf')))]:
+        if first <= lineno <= last:
+            name = qualname
+    return "{}.{}".format(module, name)
+
+
+def _is_yamft(filename):
+    return (os.path.dirname(os.path.abspath(filename)) == _YAMFT_DIR
+            and os.path.basename(filename) != 'instrument.py')
+
+
+def _attribute(traceback):
+    """Return (yamft function, stage) for the traceback of a block: the
+    innermost yamft frame and the frame it called, if any, or None if there
+    is no yamft frame"""
+    callee = None
+    for frame in reversed(traceback):  # innermost frame first
+        if _is_yamft(frame.filename):
+            stage = None if callee is None else "{}:{}".format(callee.filename, callee.lineno)
+            return _function_at(frame.filename, frame.lineno), stage
+        callee = frame
+    return None
+
+
+class AllocationTracker:
+    """Attribute the memory allocated in a block to the yamft functions, and
+    to the stages they called (the frame under the yamft frame).
+
+    `tracemalloc` only sees the blocks that are still alive when the final
+    snapshot is taken: the results of the block, the lists kept by a
+    `group_by`, etc. The short-lived blocks (e.g. the tuples of an `either`
+    consumed by a `filter_map`) are freed before the snapshot. They are
+    visible in `peak`, the peak of the traced memory during the block, to
+    compare with `base`, the traced memory at the beginning of the block.
+    Call `snapshot()` inside the block to account for the live memory at a
+    given point.
+
+    Before Python 3.9, the peak can't be reset: `peak` is the peak since
+    `tracemalloc` started tracing, i.e. since the beginning of the block
+    (including the first snapshot), or earlier if it was already tracing.
+
+    >>> from yamft import group_by, mod1
+    >>> with trace_allocations() as tracker:
+    ...     groups = group_by(mod1(10), range(10000))
+    >>> top = tracker.report(top=1)[0]
+    >>> top['function'], top['size'] > 10000 * 8
+    ('yamft.incubator.group_by', True)
+    """
+    def __init__(self, nframes=25):
+        self.nframes = nframes
+        self.peak = None
+        self.base = None
+        self._start = None
+        self._snapshot = None
+        self._started = False
+
+    def __enter__(self):
+        self._started = not tracemalloc.is_tracing()
+        if self._started:
+            tracemalloc.start(self.nframes)
+        self._start = self._take()
+        self.base = tracemalloc.get_traced_memory()[0]
+        if hasattr(tracemalloc, 'reset_peak'):  # Python 3.9+
+            tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.snapshot()
+        self.peak = tracemalloc.get_traced_memory()[1]
+        if self._started:
+            tracemalloc.stop()
+
+    def _take(self):
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__)])
+
+    def snapshot(self):
+        """Take a snapshot: the report will describe the memory allocated
+        since the beginning of the block and alive at this point"""
+        self._snapshot = self._take()
+
+    def report(self, top=10):
+        """Return the top allocating yamft functions, as dicts: function,
+        stage (file:line of the called frame, or None), size in bytes, count
+        of blocks"""
+        totals = {}
+        for stat in self._snapshot.compare_to(self._start, 'traceback'):
+            if stat.size_diff <= 0:
+                continue
+            key = _attribute(stat.traceback)
+            if key is not None:
+                size, count = totals.get(key, (0, 0))
+                totals[key] = size + stat.size_diff, count + stat.count_diff
+        rows = sorted(totals.items(), key=lambda item: item[1][0], reverse=True)
+        return [{'function': function, 'stage': stage, 'size': size, 'count': count}
+                for (function, stage), (size, count) in rows[:top]]
+
+    def to_json(self, path=None, top=10, **kwargs):
+        """Return the report, the base and the peak as a JSON string, or
+        write it to path"""
+        data = {'base': self.base, 'peak': self.peak, 'top': self.report(top)}
+        if path is None:
+            return json.dumps(data, **kwargs)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, **kwargs)
+
+
+def trace_allocations(nframes=25):
+    """Return a new `AllocationTracker`, to use in a `with` statement. nframes
+    is the depth of the tracebacks stored by `tracemalloc`, if it is not
+    already tracing"""
+    return AllocationTracker(nframes)
+
+
+def _profile_from_env():
+    value = os.environ.get('YAMFT_PROFILE')
+    if not value:
+        return None
+    profiler = Profiler().__enter__()
+    if value != '1':
+        atexit.register(profiler.to_json, value, indent=2)
+    return profiler
+
+
+_env_profiler = _profile_from_env()
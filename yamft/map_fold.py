@@ -17,6 +17,12 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import queue as _queue
+import threading as _threading
+from functools import wraps as _wraps
+from itertools import islice as _islice
+from time import monotonic as _monotonic
+
 from yamft import star, dot
 
 
@@ -55,6 +61,113 @@ def apply_all(funcs, *iterables):
     return zip(*(map(lambda func: map(func, *iterables), funcs)))
 
 
+_BATCH_END = object()
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(_islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _read_into(iterable, q, stop):
+    """Read the iterable into the queue, in a thread, until stop is set"""
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.05)
+                return True
+            except _queue.Full:
+                pass
+        return False
+
+    try:
+        for element in iterable:
+            if not put((element, None)):
+                return
+    except BaseException as e:
+        put((_BATCH_END, e))
+    else:
+        put((_BATCH_END, None))
+
+
+def _timed_batches(iterable, size, max_wait):
+    """Yield the batches: a batch is complete when it has size elements, or
+    max_wait seconds after its first element"""
+    q = _queue.Queue(2 * size)
+    stop = _threading.Event()
+    _threading.Thread(target=_read_into, args=(iterable, q, stop), daemon=True).start()
+    try:
+        while True:
+            element, error = q.get()
+            batch = []
+            deadline = _monotonic() + max_wait
+            while element is not _BATCH_END:
+                batch.append(element)
+                timeout = deadline - _monotonic()
+                if len(batch) == size or timeout <= 0:
+                    break
+                try:
+                    element, error = q.get(timeout=timeout)
+                except _queue.Empty:
+                    break
+            if batch:
+                yield batch
+            if element is _BATCH_END:
+                if error is not None:
+                    raise error
+                return
+    finally:
+        stop.set()
+
+
+def map_batched(bulk_func, iterable, size=64, max_wait=None, excs=None):
+    """A version of map for the bulk functions (a lookup, a RPC, a vectorized
+    computation): `bulk_func` is called with lists of at most `size`
+    elements, and returns one result per element. The results are flattened
+    in order. If `max_wait` is set, a batch is sent at most `max_wait`
+    seconds after its first element was read, even if it is not full (the
+    iterable is read by a thread).
+
+    >>> list(map_batched(lambda xs: [x * 10 for x in xs], range(5), size=2))
+    [0, 10, 20, 30, 40]
+
+    If `excs` is set (an exception class or a tuple), the results are
+    `either` values: an exception of excs raised by `bulk_func` fails every
+    element of the batch, an exception of excs returned in place of a result
+    fails this element (a partial failure).
+
+    >>> def lookup(keys):
+    ...     d = {1: 'a', 2: 'b'}
+    ...     return [d[k] if k in d else KeyError(k) for k in keys]
+    >>> list(map_batched(lookup, [1, 3, 2], excs=KeyError))
+    [('a', None), (None, KeyError(3)), ('b', None)]
+    """
+    batches = _batches(iterable, size) if max_wait is None else _timed_batches(
+        iterable, size, max_wait)
+    for batch in batches:
+        if excs is None:
+            results = bulk_func(batch)
+        else:
+            try:
+                results = bulk_func(batch)
+            except excs as e:
+                yield from [(None, e)] * len(batch)
+                continue
+        results = list(results)
+        if len(results) != len(batch):
+            raise ValueError("{} results for a batch of {} elements".format(
+                len(results), len(batch)))
+        if excs is None:
+            yield from results
+        else:
+            for result in results:
+                yield (None, result) if isinstance(result, excs) else (result, None)
+
+
 # The FOLD section
 
 def reduce_r(function, sequence, lazy_last=None):
@@ -152,6 +265,59 @@ def reduce_r(function, sequence, lazy_last=None):
             return lazy_last()
 
 
+class tail_call:
+    """The tail call `func(*args)`, to return from a `trampoline` function:
+    the call is made by the trampoline, after the return. For keyword
+    arguments, use a `functools.partial`."""
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __repr__(self):
+        return "tail_call({})".format(", ".join(
+            [getattr(self.func, '__name__', repr(self.func)), *map(repr, self.args)]))
+
+
+def trampoline(func):
+    """Decorate a tail recursive function that returns `tail_call(f, *args)`
+    instead of `f(*args)`: the tail calls are run in a loop, hence the stack
+    does not grow and the recursion limit does not apply. The tail calls to
+    other `trampoline` functions (mutual recursion) are run in the same loop.
+
+    >>> @trampoline
+    ... def length(seq, acc=0):
+    ...     from yamft.operator import destr
+    ...     return tail_call(length, destr(seq)[1], acc + 1) if seq else acc
+    >>> length(list(range(100000)))
+    100000
+
+    >>> @trampoline
+    ... def is_even(n):
+    ...     return True if n == 0 else tail_call(is_odd, n - 1)
+    >>> @trampoline
+    ... def is_odd(n):
+    ...     return False if n == 0 else tail_call(is_even, n - 1)
+    >>> is_even(100001), is_odd(100001)
+    (False, True)
+    """
+    @_wraps(func)
+    def trampolined(*args, **kwargs):
+        result = func(*args, **kwargs)
+        f = body = None
+        while type(result) is tail_call:
+            if result.func is not f:
+                f = result.func
+                # don't start a new loop for a trampoline function
+                body = getattr(f, '_trampoline_body', f)
+            result = body(*result.args)
+        return result
+
+    trampolined._trampoline_body = func
+    return trampolined
+
+
 def map_keys(func, d):
     """
 
@@ -209,4 +375,139 @@ def map_fth(func, items):
     >>> list(map_fth(ord, [(1,1,1,'A'), (2,2,2,'B')]))
     [(1, 1, 1, 65), (2, 2, 2, 66)]
     """
-    return ((one, two, three, func(four), *other) for one, two, three, four, *other in items)
\ No newline at end of file
+    return ((one, two, three, func(four), *other) for one, two, three, four, *other in items)
+
+# The UNFOLD section
+
+def unfold(func, seed):
+    """Equivalent to Haskell's `unfoldr` function. `func(seed)` returns either
+    None to stop, or a tuple `(value, next_seed)`.
+
+    >>> list(unfold(lambda n: None if n > 100 else (n, n * 2), 1))
+    [1, 2, 4, 8, 16, 32, 64]
+    >>> import itertools
+    >>> list(itertools.islice(unfold(lambda ab: (ab[0], (ab[1], sum(ab))), (0, 1)), 10))
+    [0, 1, 1, 2, 3, 5, 8, 13, 21, 34]
+    """
+    while True:
+        ret = func(seed)
+        if ret is None:
+            return
+        value, seed = ret
+        yield value
+
+
+class IterState:
+    """The state of an `iterate`: the number of the step, the value and the
+    distance to the previous value (None at step 0, or if there is no `tol`).
+    """
+    __slots__ = ('step', 'value', 'delta')
+
+    def __repr__(self):
+        return f"IterState(step={self.step}, value={self.value!r}, delta={self.delta!r})"
+
+
+def _distance(a, b):
+    return abs(a - b)
+
+
+def iterate(func, x, test=None, tol=None, dist=_distance, cycle=False, max_steps=None, state=False):
+    """Yield `x, func(x), func(func(x)), ...` with an early stop. Only the
+    current value is kept in memory.
+
+    * `test`: stop before the first value that doesn't match `test` (as
+      `BoxB.iterate`);
+    * `tol`: stop after the first value whose distance to the previous value
+      (`dist(value, previous)`, by default `abs(value - previous)`) is lower
+      or equal to `tol`;
+    * `cycle`: stop when a cycle is detected (Brent's algorithm, values are
+      compared with `==`). Every value of the cycle has been yielded, but some
+      of them may have been yielded twice: use `find_cycle` to get the exact
+      cycle;
+    * `max_steps`: yield at most `max_steps` values.
+
+    If `state` is True, the same `IterState` record is yielded at every step.
+
+    >>> from yamft import add1
+    >>> list(iterate(add1(3), 1, test=lambda x: x < 15))
+    [1, 4, 7, 10, 13]
+    >>> list(iterate(add1(3), 1, max_steps=3))
+    [1, 4, 7]
+
+    Newton's method for sqrt(2):
+
+    >>> [round(x, 6) for x in iterate(lambda x: (x + 2 / x) / 2, 1.0, tol=1e-9)]
+    [1.0, 1.5, 1.416667, 1.414216, 1.414214, 1.414214]
+    >>> for s in iterate(lambda x: (x + 2 / x) / 2, 1.0, tol=1e-9, state=True):
+    ...     pass
+    >>> s.step, s.delta < 1e-9
+    (5, True)
+
+    >>> list(iterate(lambda x: (x * x + 1) % 11, 0, cycle=True))
+    [0, 1, 2, 5, 4, 6, 4, 6, 4]
+    """
+    record = IterState() if state else None
+    step = 0
+    delta = None
+    tortoise, power, lam = x, 1, 0
+    while max_steps is None or step < max_steps:
+        if record is None:
+            yield x
+        else:
+            record.step, record.value, record.delta = step, x, delta
+            yield record
+        step += 1
+        if tol is not None and delta is not None and delta <= tol:
+            return
+
+        next_x = func(x)
+        if test is not None and not test(next_x):
+            return
+        if tol is not None:
+            delta = dist(next_x, x)
+        if cycle:
+            if power == lam:
+                tortoise, power, lam = x, power * 2, 0
+            lam += 1
+            if next_x == tortoise:
+                return
+        x = next_x
+
+
+def find_cycle(func, x, max_steps=None):
+    """Find the cycle of the sequence `x, func(x), func(func(x)), ...` in
+    constant memory (Brent's algorithm). Return `(mu, lam)` where `mu` is the
+    index of the first value of the cycle and `lam` the length of the cycle, or
+    None if no cycle was found in `max_steps` steps.
+
+    >>> find_cycle(lambda x: (x * x + 1) % 11, 0)
+    (4, 2)
+
+    Hence the values before the first repetition are:
+
+    >>> import itertools
+    >>> list(itertools.islice(iterate(lambda x: (x * x + 1) % 11, 0), 4 + 2))
+    [0, 1, 2, 5, 4, 6]
+    >>> find_cycle(lambda x: x + 1, 0, max_steps=1000) is None
+    True
+    """
+    power = lam = 1
+    tortoise, hare = x, func(x)
+    steps = 1
+    while tortoise != hare:
+        if max_steps is not None and steps >= max_steps:
+            return None
+        if power == lam:
+            tortoise, power, lam = hare, power * 2, 0
+        hare = func(hare)
+        lam += 1
+        steps += 1
+
+    tortoise = hare = x
+    for _ in range(lam):
+        hare = func(hare)
+    mu = 0
+    while tortoise != hare:
+        tortoise, hare = func(tortoise), func(hare)
+        mu += 1
+    return mu, lam
@@ -41,6 +41,7 @@
 has an equivalent `<bin1>(b)` so that `<bin1>(b)(a) = `<bin>(a, b)`"""
 
 __all__ = ['add1', 'and1', 'bw_and1', 'bw_or1', 'concat1', 'contains1', 'countOf1',
+           'countsOf1',
            'delitem1', 'eq1', 'floordiv1', 'ge1', 'getitem1', 'gt1',
            'iconcat1', 'imatmul1', 'indexOf1', 'is1', 'is_not1', 'le1',
            'lt1', 'matmul1', 'mod1', 'mul1', 'ne1', 'or1', 'pow1',
@@ -48,81 +49,181 @@ __all__ = ['add1', 'and1', 'bw_and1', 'bw_or1', 'concat1', 'contains1', 'countOf
            'dget', 'square', 'cube', 'split1']
 
 
-from yamft import yamft_wraps
+import math
+import operator as _operator
+import sys
+from collections import Counter
+from collections.abc import Sequence
+
+from yamft import Combinator
+
+# Interned operators: `eq1(5) is eq1(5)`. The operand type is part of the key,
+# because `1 == 1.0 == True` but `add1(1)` is not `add1(1.0)`, and so is the
+# sign of a float, because `0.0 == -0.0`. The cache holds strong references
+# (a weak-value cache would be emptied as soon as the operator of a
+# `[x for x in data if gt1(t)(x)]` is dropped), hence it is bounded and long
+# strings are not interned.
+_INTERNABLE = {int, float, complex, bool, type(None)}
+_INTERNABLE_SIZED = {str, bytes}
+_MAX_INTERNED_LEN = 256
+_MAX_INTERNED = 1024
+_interned = {}
+
+
+def _numpy_vector(a):
+    """Return the numpy module if a is a one-dimensional numpy array. numpy is
+    never imported here: if it is not loaded, a can't be an array."""
+    np = sys.modules.get('numpy')
+    if np is not None and isinstance(a, np.ndarray) and a.ndim == 1:
+        return np
+    return None
+
+
+def _is_char_search(t, b):
+    """True if the needle b of a str, bytes or bytearray of type t is a single
+    element, ie `a.count(b)` counts items, not substrings."""
+    if t is str:
+        return type(b) is str and len(b) == 1
+    if t is bytes or t is bytearray:
+        return type(b) is int and 0 <= b < 256
+    return False
+
+
+def _byte_exporter(view, b):
+    """Return the bytes or bytearray exported as a whole by the memoryview
+    view, if view is a flat unsigned char view and b one of its items, else
+    None. The exporter is searched without any copy; the offset of a partial
+    view is unknown, so it must be searched item by item."""
+    obj = view.obj
+    if (type(obj) is bytes or type(obj) is bytearray) and view.format == 'B' \
+            and view.ndim == 1 and type(b) is int and 0 <= b < 256 \
+            and view.nbytes == len(obj):
+        return obj
+    return None
+
+
+def _intern(key, obj):
+    if len(_interned) >= _MAX_INTERNED:
+        # drop the oldest item, as `re` does
+        try:
+            del _interned[next(iter(_interned))]
+        except (StopIteration, RuntimeError, KeyError):
+            pass
+    _interned[key] = obj
+    return obj
+
+
+class Operator1(Combinator):
+    """Base class of the `<bin1>(b)` operators. If the operand is a number,
+    a short string, a short bytes or None, the operator is interned:
+
+    >>> eq1(5) is eq1(5), eq1(5) is eq1(5.0), eq1([5]) is eq1([5])
+    (True, False, False)
+    >>> eq1([5]) == eq1([5]), eq1(5) == eq1(5.0)
+    (True, False)
+
+    Interned operators are shared: never change their operand.
+    """
+    __slots__ = ('b',)
+    _fields = ('b',)
+
+    def __new__(cls, b):
+        t = type(b)
+        if t in _INTERNABLE or t in _INTERNABLE_SIZED and len(b) <= _MAX_INTERNED_LEN:
+            key = (cls, t, b) if t is not float else (cls, t, b, math.copysign(1.0, b))
+            op = _interned.get(key)
+            if op is not None:
+                return op
+        else:
+            key = None
+        op = object.__new__(cls)
+        op.b = b
+        return op if key is None else _intern(key, op)
+
+    def _key(self):
+        return type(self), type(self.b), self.b
+
 
 # Comparison Operations *******************************************************#
 
 
-def lt1(b):
+class lt1(Operator1):
     """Return a function a -> (a < b)."""
-    @yamft_wraps(f"lt_{b}", f"Same as a < {b}.")
-    def wrapped(a):
-        return a < b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a < {b}."
 
+    def __call__(self, a):
+        return a < self.b
 
-def le1(b):
+
+class le1(Operator1):
     """Return a function a -> (a <= b)."""
-    @yamft_wraps(f"le_{b}", f"Same as a <= {b}.")
-    def wrapped(a):
-        return a <= b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a <= {b}."
+
+    def __call__(self, a):
+        return a <= self.b
 
 
-def eq1(b):
+class eq1(Operator1):
     """Return a function a -> (a == b).
 
     >>> eq1(10)(5)
     False
     """
-    @yamft_wraps(f"eq_{b}", f"Same as a == {b}.")
-    def wrapped(a):
-        return a == b
+    __slots__ = ()
+    _doc = "Same as a == {b}."
 
-    return wrapped
+    def __call__(self, a):
+        return a == self.b
 
 
-def ne1(b):
+class ne1(Operator1):
     """Return a function a -> (a != b)."""
-    @yamft_wraps(f"ne_{b}", f"Same as a != {b}.")
-    def wrapped(a):
-        return a != b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a != {b}."
 
+    def __call__(self, a):
+        return a != self.b
 
-def ge1(b):
+
+class ge1(Operator1):
     """Return a function a -> (a >= b)."""
-    @yamft_wraps(f"ge_{b}", f"Same as a >= {b}.")
-    def wrapped(a):
-        return a >= b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a >= {b}."
+
+    def __call__(self, a):
+        return a >= self.b
 
 
-def gt1(b):
+class gt1(Operator1):
     """Return a function a -> (a > b)."""
-    @yamft_wraps(f"gt_{b}", f"Same as a > {b}.")
-    def wrapped(a):
-        return a > b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a > {b}."
+
+    def __call__(self, a):
+        return a > self.b
 
 
 # Logical Operations **********************************************************#
 
 
-def is1(b):
+class is1(Operator1):
     """Return a function a -> (a is b)."""
-    @yamft_wraps(f"is_{b}", f"Same as a is {b}.")
-    def wrapped(a):
-        return a is b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a is {b}."
+
+    def __call__(self, a):
+        return a is self.b
 
 
-def is_not1(b):
+class is_not1(Operator1):
     """Return a function a -> (a is b)."""
-    @yamft_wraps(f"is_not_{b}", f"Same as a is not {b}.")
-    def wrapped(a):
-        return a is not b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a is not {b}."
+
+    def __call__(self, a):
+        return a is not self.b
 
 
 def is_none(a):
@@ -135,84 +236,94 @@ def is_not_none(a):
 # Mathematical/Bitwise Operations *********************************************#
 
 
-def add1(b):
+class add1(Operator1):
     """Return a function a -> (a + b)."""
-    @yamft_wraps(f"add_{b}", f"Same as a + {b}.")
-    def wrapped(a):
-        return a + b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a + {b}."
+
+    def __call__(self, a):
+        return a + self.b
 
 
-def bw_and1(b):
+class bw_and1(Operator1):
     """Return a function a -> (a & b)."""
-    @yamft_wraps(f"bw_and_{b}", f"Same as a & {b}.")
-    def wrapped(a):
-        return a & b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a & {b}."
 
+    def __call__(self, a):
+        return a & self.b
 
-def floordiv1(b):
+
+class floordiv1(Operator1):
     """Return a function a -> a // b."""
-    @yamft_wraps(f"floordiv_{b}", f"Same as a // {b}.")
-    def wrapped(a):
-        return a // b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a // {b}."
+
+    def __call__(self, a):
+        return a // self.b
 
 
-def lshift1(b):
+class lshift1(Operator1):
     """Return a function a -> a << b."""
-    @yamft_wraps(f"lshift_{b}", f"Same as a << {b}.")
-    def wrapped(a):
-        return a << b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a << {b}."
 
+    def __call__(self, a):
+        return a << self.b
 
-def mod1(b):
+
+class mod1(Operator1):
     """Return a function a -> a % b."""
-    @yamft_wraps(f"mod_{b}", f"Same as a % {b}.")
-    def wrapped(a):
-        return a % b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a % {b}."
+
+    def __call__(self, a):
+        return a % self.b
 
 
-def mul1(b):
+class mul1(Operator1):
     """Return a function a -> a * b."""
-    @yamft_wraps(f"mul_{b}", f"Same as a * {b}.")
-    def wrapped(a):
-        return a * b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a * {b}."
 
+    def __call__(self, a):
+        return a * self.b
 
-def matmul1(b):
+
+class matmul1(Operator1):
     """Return a function a -> a @ b."""
-    @yamft_wraps(f"matmul_{b}", f"Same as a @ {b}.")
-    def wrapped(a):
-        return a @ b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a @ {b}."
+
+    def __call__(self, a):
+        return a @ self.b
 
 
-def bw_or1(b):
+class bw_or1(Operator1):
     """Return a function a -> a | b."""
-    @yamft_wraps(f"bw_or_{b}", f"Same as a | {b}.")
-    def wrapped(a):
-        return a | b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a | {b}."
 
+    def __call__(self, a):
+        return a | self.b
 
-def or1(b):
+
+class or1(Operator1):
     """Return a function a -> a or b."""
-    @yamft_wraps(f"or_{b}", f"Same as a or {b}.")
-    def wrapped(a):
-        return a or b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a or {b}."
+
+    def __call__(self, a):
+        return a or self.b
 
 
-def pow1(b):
+class pow1(Operator1):
     """Return a function a -> a ** b."""
-    @yamft_wraps(f"pow_{b}", f"Same as a ** {b}.")
-    def wrapped(a):
-        return a ** b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a ** {b}."
+
+    def __call__(self, a):
+        return a ** self.b
 
 
 def square(i):
@@ -223,149 +334,266 @@ def cube(i):
     return i*i*i
 
 
-def rshift1(b):
+class rshift1(Operator1):
     """Return a function a -> a >> b."""
-    @yamft_wraps(f"rshift_{b}", f"Same as a >> {b}.")
-    def wrapped(a):
-        return a >> b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a >> {b}."
+
+    def __call__(self, a):
+        return a >> self.b
 
 
-def sub1(b):
+class sub1(Operator1):
     """Return a function a -> a * b."""
-    @yamft_wraps(f"sub_{b}", f"Same as a - {b}.")
-    def wrapped(a):
-        return a - b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a - {b}."
 
+    def __call__(self, a):
+        return a - self.b
 
-def truediv1(b):
+
+class truediv1(Operator1):
     """Return a function a -> a / b."""
-    @yamft_wraps(f"truediv_{b}", f"Same as a / {b}.")
-    def wrapped(a):
-        return a / b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a / {b}."
+
+    def __call__(self, a):
+        return a / self.b
 
 
-def xor1(b):
+class xor1(Operator1):
     """Return a function a -> a ^ b."""
-    @yamft_wraps(f"xor_{b}", f"Same as a ^ {b}.")
-    def wrapped(a):
-        return a ^ b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a ^ {b}."
+
+    def __call__(self, a):
+        return a ^ self.b
 
 
 # Sequence Operations *********************************************************#
 
 
-def concat1(b):
+class concat1(Operator1):
     """Return a function a -> (a + b) for sequences."""
-    if not hasattr(b, '__getitem__'):
-        msg = "'{}' object can't be concatenated".format(type(b).__name__)
-        raise TypeError(msg)
+    __slots__ = ()
+    _doc = "Same as a + {b} for sequences."
 
-    @yamft_wraps(f"concat_{b}", f"Same as a + {b} for sequences.")
-    def wrapped(a):
-        return a + b
+    def __new__(cls, b):
+        if not hasattr(b, '__getitem__'):
+            msg = "'{}' object can't be concatenated".format(type(b).__name__)
+            raise TypeError(msg)
+        return super().__new__(cls, b)
 
-    return wrapped
+    def __call__(self, a):
+        return a + self.b
 
 
-def contains1(b):
+class contains1(Operator1):
     """Return a function a -> b in a."""
-    @yamft_wraps(f"contains_{b}", f"Same as {b} in a.")
-    def wrapped(a):
-        return b in a
-
-    return wrapped
-
-
-def countOf1(b):
-    """Return a function a -> the number of times b occurs in a."""
-    @yamft_wraps(f"countOf_{b}", f"Same as count of {b} in a.")
-    def wrapped(a):
-        count = 0
-        for i in a:
-            if i == b:
-                count += 1
-        return count
-
-    return wrapped
-
-
-def delitem1(b):
+    __slots__ = ()
+    _doc = "Same as {b} in a."
+
+    def __call__(self, a):
+        return self.b in a
+
+
+class countOf1(Operator1):
+    """Return a function a -> the number of times b occurs in a. The count is
+    delegated to the fastest primitive for the type of a: `list.count`,
+    `bytes.count` (also for a memoryview of a whole bytes or bytearray),
+    `numpy.count_nonzero`, and `operator.countOf` otherwise.
+
+    >>> countOf1(1)([1, 2, 1, 3])
+    2
+    >>> countOf1(ord('a'))(b'banana')
+    3
+    >>> countOf1('an')('banana')
+    0
+    >>> countOf1(1)(x % 3 for x in range(10))
+    3
+    """
+    __slots__ = ()
+    _doc = "Same as count of {b} in a."
+
+    def __call__(self, a):
+        b = self.b
+        t = type(a)
+        if t is list or t is tuple:
+            return a.count(b)
+        if _is_char_search(t, b):
+            return a.count(b)
+        if t is memoryview:
+            whole = _byte_exporter(a, b)
+            if whole is not None:
+                return whole.count(b)
+        array = _numpy_vector(a)
+        if array is not None:
+            return int(array.count_nonzero(a == b))
+        return _operator.countOf(a, b)
+
+
+class delitem1(Operator1):
     """Return a function a -> del a[b]."""
-    @yamft_wraps(f"delitem_{b}", f"Same as del a[{b}].")
-    def wrapped(a):
-        del a[b]
+    __slots__ = ()
+    _doc = "Same as del a[{b}]."
 
-    return wrapped
+    def __call__(self, a):
+        del a[self.b]
 
 
-def getitem1(b):
+class getitem1(Operator1):
     """Return a function a -> a[b]."""
-    @yamft_wraps(f"getitem_{b}", f"Same as count of a[{b}].")
-    def wrapped(a):
-        return a[b]
+    __slots__ = ()
+    _doc = "Same as a[{b}]."
+
+    def __call__(self, a):
+        return a[self.b]
+
+
+class indexOf1(Operator1):
+    """Return a function a -> the first index of b in a. As `countOf1`, the
+    search is delegated to `list.index`, `bytes.find`, `numpy.argmax` or
+    `operator.indexOf`.
+
+    >>> indexOf1(3)([1, 2, 3, 3])
+    2
+    >>> indexOf1(ord('n'))(bytearray(b'banana'))
+    2
+    >>> indexOf1(4)(iter([1, 2, 3]))
+    Traceback (most recent call last):
+    ...
+    ValueError: sequence.index(x): x not in sequence
+    """
+    __slots__ = ()
+    _doc = "Return the first index of {b} in a."
+
+    def __call__(self, a):
+        b = self.b
+        t = type(a)
+        if t is list or t is tuple:
+            try:
+                return a.index(b)
+            except ValueError:
+                raise ValueError('sequence.index(x): x not in sequence') from None
+        if _is_char_search(t, b):
+            i = a.find(b)
+        elif t is memoryview and _byte_exporter(a, b) is not None:
+            i = a.obj.find(b)
+        else:
+            array = _numpy_vector(a)
+            if array is None:
+                return _operator.indexOf(a, b)
+            found = a == b
+            i = int(found.argmax()) if len(a) else -1
+            if i >= 0 and not found[i]:
+                i = -1
+        if i == -1:
+            raise ValueError('sequence.index(x): x not in sequence')
+        return i
+
 
-    return wrapped
+# Below these numbers of needles, one `count` per needle beats a `Counter`
+# (CPython 3.11: a `Counter` costs ~2.5 `list.count` or ~50 `bytes.count`).
+_BATCH_MIN_SEQ = 2
+_BATCH_MIN_STR = 48
 
 
-def indexOf1(b):
-    """Return a function a -> b.index(1)."""
-    @yamft_wraps(f"indexof_{b}", f"Return the first index of b in a.")
-    def wrapped(a):
-        for i, j in enumerate(a):
-            if j == b:
-                return i
+class countsOf1(Combinator):
+    """Return a function a -> the list of the number of times each of the
+    needles bs occurs in a. When there are many needles and the elements are
+    hashable, the haystack is counted in one pass with a `Counter`, instead of
+    one pass per needle.
+
+    >>> countsOf1([1, 2, 4])([1, 2, 1, 3, 1])
+    [3, 1, 0]
+    >>> countsOf1(b'an')(b'banana')
+    [3, 2]
+    >>> countsOf1([[1], [3]])(iter([[1], [2], [1]]))
+    [2, 0]
+    """
+    __slots__ = ('bs',)
+    _fields = ('bs',)
+    _doc = "Same as the counts of each of {bs} in a."
+
+    def __init__(self, bs):
+        self.bs = tuple(bs)
+
+    def __call__(self, a):
+        bs = self.bs
+        t = type(a)
+        if t is list or t is tuple:
+            if len(bs) <= _BATCH_MIN_SEQ:
+                return [a.count(b) for b in bs]
+        elif t is str or t is bytes or t is bytearray:
+            if len(bs) <= _BATCH_MIN_STR:
+                return [countOf1(b)(a) for b in bs]
+        elif t is memoryview or _numpy_vector(a) is not None:
+            a = a.tolist()
         else:
-            raise ValueError('sequence.index(x): x not in sequence')
-    return wrapped
+            a = list(a)  # may be read again below
+        try:
+            counter = Counter(a)
+            return [counter[b] for b in bs]
+        except TypeError:  # unhashable elements or needles
+            return [countOf1(b)(a) for b in bs]
 
 
-def setitem1(b, c):
+class setitem1(Combinator):
     """Return a function a -> a[b] = c."""
-    @yamft_wraps(f"setitem_{b}_{c}", f"Same as a[{b}] = {c}.")
-    def wrapped(a):
-        a[b] = c
-    return wrapped
+    __slots__ = ('b', 'c')
+    _fields = ('b', 'c')
+    _doc = "Same as a[{b}] = {c}."
+
+    def __init__(self, b, c):
+        self.b = b
+        self.c = c
+
+    def __call__(self, a):
+        a[self.b] = self.c
 
 
 # In-place Operations *********************************************************#
 
 
-def iconcat1(b):
+class iconcat1(Operator1):
     """Return a function a -> (a += b), for a and b sequences."""
-    if not hasattr(b, '__getitem__'):
-        msg = "'{}' object can't be concatenated".format(type(b.__name__))
-        raise TypeError(msg)
+    __slots__ = ()
+    _doc = "Same as a += {b} for sequences."
 
-    @yamft_wraps(f"iconcat_{b}", f"Same as a += {b} for sequences.")
-    def wrapped(a):
-        a += b
-        return a
+    def __new__(cls, b):
+        if not hasattr(b, '__getitem__'):
+            msg = "'{}' object can't be concatenated".format(type(b).__name__)
+            raise TypeError(msg)
+        return super().__new__(cls, b)
 
-    return wrapped
+    def __call__(self, a):
+        a += self.b
+        return a
 
 
-def imatmul1(b):
+class imatmul1(Operator1):
     """Return a function a -> (a @= b), for a and b sequences."""
-    if not hasattr(b, '__getitem__'):
-        msg = "'{}' object can't be concatenated".format(type(b.__name__))
-        raise TypeError(msg)
+    __slots__ = ()
+    _doc = "Same as a @= {b} for sequences."
+
+    def __new__(cls, b):
+        if not hasattr(b, '__getitem__'):
+            msg = "'{}' object can't be concatenated".format(type(b).__name__)
+            raise TypeError(msg)
+        return super().__new__(cls, b)
 
-    @yamft_wraps(f"imatmul_{b}", f"Same as a @= {b} for sequences.")
-    def wrapped(a):
-        a @= b
+    def __call__(self, a):
+        a @= self.b
         return a
 
 
-def and1(b):
+class and1(Operator1):
     """Return a function a -> (a and b)."""
-    @yamft_wraps(f"and_{b}", f"Same as a and {b}.")
-    def wrapped(a):
-        return a and b
-    return wrapped
+    __slots__ = ()
+    _doc = "Same as a and {b}."
+
+    def __call__(self, a):
+        return a and self.b
 
 ## lazy operators
 
@@ -386,20 +614,124 @@ def lazy_cons(a, b):
     return [a] + b()
 
 
-def dget(k, d=None):
-    return lambda D: D.get(k, d)
+class dget(Combinator):
+    """Return a function D -> D.get(k, d).
+
+    >>> dget('a')({'a': 1}), dget('b', 0)({'a': 1})
+    (1, 0)
+    >>> dget('a') == dget('a')
+    True
+    """
+    __slots__ = ('k', 'd')
+    _fields = ('k', 'd')
+    _doc = "Same as D.get({k}, {d})."
 
+    def __init__(self, k, d=None):
+        self.k = k
+        self.d = d
 
-def split1(sep=None, maxsplits=-1):
-    return lambda s: s.split(sep, maxsplits)
+    def __call__(self, D):
+        return D.get(self.k, self.d)
 
 
-def destr(sequence):
+class split1(Combinator):
+    """Return a function s -> s.split(sep, maxsplits).
+
+    >>> split1('=')('a=b=c'), split1('=', 1)('a=b=c')
+    (['a', 'b', 'c'], ['a', 'b=c'])
+    """
+    __slots__ = ('sep', 'maxsplits')
+    _fields = ('sep', 'maxsplits')
+    _doc = "Same as s.split({sep}, {maxsplits})."
+
+    def __init__(self, sep=None, maxsplits=-1):
+        self.sep = sep
+        self.maxsplits = maxsplits
+
+    def __call__(self, s):
+        return s.split(self.sep, self.maxsplits)
+
+
+class SeqView(Sequence):
+    """A read-only view of base[start:stop], for a list or a tuple: slicing a
+    view with a step of 1 returns a view of the same base, without any copy.
+    The changes of the base are visible in the view.
+
+    >>> v = SeqView([0, 1, 2, 3, 4], 1)
+    >>> v, len(v), v[-1], v[1:3], list(v[::2])
+    (SeqView([1, 2, 3, 4]), 4, 4, SeqView([2, 3]), [1, 3])
+    >>> v == [1, 2, 3, 4], v[1:] == SeqView([9, 2, 3, 4], 1), v == (1, 2, 3, 4), [0] + v
+    (True, True, False, [0, 1, 2, 3, 4])
     """
+    __slots__ = ('base', 'start', 'stop')
+
+    def __init__(self, base, start=0, stop=None):
+        self.base = base
+        self.start = start
+        self.stop = len(base) if stop is None else stop
+
+    def _copy(self):
+        return self.base[self.start:self.stop]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            r = range(self.start, self.stop)[index]
+            if r.step == 1:
+                return SeqView(self.base, r.start, max(r.start, r.stop))
+            return type(self.base)(map(self.base.__getitem__, r))
+        index = _operator.index(index)
+        n = self.stop - self.start
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("SeqView index out of range")
+        return self.base[self.start + index]
+
+    def __iter__(self):
+        if self.start == 0 and self.stop == len(self.base):
+            return iter(self.base)
+        return map(self.base.__getitem__, range(self.start, self.stop))
+
+    def __eq__(self, other):
+        if isinstance(other, SeqView):
+            other_type = type(other.base)
+        elif isinstance(other, (list, tuple)):
+            other_type = type(other)
+        else:
+            return NotImplemented
+        return (other_type is type(self.base) and len(self) == len(other)
+                and all(map(_operator.eq, self, other)))
+
+    __hash__ = None
+
+    def __add__(self, other):
+        return self._copy() + (other._copy() if isinstance(other, SeqView) else other)
+
+    def __radd__(self, other):
+        return other + self._copy()
+
+    def __repr__(self):
+        return "SeqView({!r})".format(self._copy())
+
+
+def destr(sequence):
+    """Return the head and the tail of the sequence. The tail of a list, a
+    tuple or a `SeqView` is a `SeqView`, the tail of a bytes-like object is a
+    `memoryview`: there is no copy, and a head/tail recursion is linear.
 
     >>> destr([1,2,3])
-    (1, [2, 3])
+    (1, SeqView([2, 3]))
     >>> dict(map(destr, [[1,2,3], [4,5,6]]))
-    {1: [2, 3], 4: [5, 6]}
+    {1: SeqView([2, 3]), 4: SeqView([5, 6])}
+    >>> head, tail = destr(b"abc")
+    >>> head, bytes(tail), destr(tail)[1] == b"c", destr("abc")
+    (97, b'bc', True, ('a', 'bc'))
     """
-    return sequence[0], sequence[1:]
\ No newline at end of file
+    if isinstance(sequence, (list, tuple)):
+        return sequence[0], SeqView(sequence, 1)
+    if isinstance(sequence, (bytes, bytearray)):
+        sequence = memoryview(sequence)
+    return sequence[0], sequence[1:]
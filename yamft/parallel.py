@@ -0,0 +1,560 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Parallel maps.
+
+`adaptive_map(func, *iterables)` is a lazy and ordered `map` that decides how
+to run: it calls func on a few items inline, measures the time per item, the
+share of this time spent on the CPU, and the size of the pickled arguments
+and results. Then it runs the rest serially, in a thread pool (the items wait
+for I/O, or release the GIL) or in a process pool (the items are CPU bound
+and cheap to pickle), by chunks long enough to hide the cost of a task.
+
+    >>> list(adaptive_map(abs, range(-3, 3)))
+    [3, 2, 1, 0, 1, 2]
+
+The decision is a `Plan`. An `AdaptiveMap` keeps the plan of its first call,
+so that the plan of a call site is computed once, can be inspected, and can be
+pinned:
+
+    >>> abs_all = AdaptiveMap(abs)
+    >>> list(abs_all(range(-300, 0)))[:3]
+    [300, 299, 298]
+    >>> abs_all.plan.mode, abs_all.plan.reason
+    ('serial', 'too little work')
+    >>> list(AdaptiveMap(abs, plan=Plan('thread', workers=2))([-1, -2]))
+    [1, 2]
+
+`thread_imap(func, *iterables)` is a lazy map for I/O bound functions, that
+keeps a fixed number of calls in flight in a thread pool.
+
+`speculative_find_first(func, iterable)` is a `find_first` for an expensive
+predicate: the predicate runs on the next values in a pool, and the pending
+calls are cancelled as soon as the first match is known.
+
+`StagedDot(*stages)` is the pipeline-parallel counterpart of a `dot`: every
+stage has its own workers (threads or processes), and the stages are linked
+by bounded queues, hence an I/O bound stage and a CPU bound stage overlap,
+while the memory stays bounded.
+
+    >>> list(StagedDot(str, Stage(abs, workers=2))([-1, -2, 3]))
+    ['1', '2', '3']
+"""
+
+__all__ = ['Plan', 'AdaptiveMap', 'adaptive_map', 'thread_imap', 'speculative_find_first',
+           'Stage', 'StagedDot']
+
+import os
+import pickle
+import queue
+import threading
+from collections import deque
+from concurrent.futures import (ThreadPoolExecutor, ProcessPoolExecutor, wait,
+                                FIRST_COMPLETED)
+from itertools import islice
+from time import perf_counter, thread_time
+
+# Below this share of CPU time, an item mostly waits: threads can overlap it
+_IO_RATIO = 0.5
+# Below this estimated total time, a pool costs more than it saves
+_MIN_PARALLEL_WORK = 0.05
+# Target durations of a chunk (a task) in a thread or a process pool
+_THREAD_TASK_TIME = 0.002
+_PROCESS_TASK_TIME = 0.02
+# Rough cost of pickling, sending and unpickling one byte
+_BYTE_TIME = 5e-9
+# The sample stops after this number of items, or this time
+_SAMPLE_SIZE = 16
+_SAMPLE_TIME = 0.1
+
+
+class Plan:
+    """How an `adaptive_map` runs: the mode ('serial', 'thread' or
+    'process'), the number of workers, the number of items per task, and the
+    measures that led to the decision (None if the plan is pinned)."""
+    __slots__ = ('mode', 'workers', 'chunksize', 'item_time', 'cpu_ratio',
+                 'transfer', 'reason')
+
+    def __init__(self, mode, workers=None, chunksize=1, item_time=None,
+                 cpu_ratio=None, transfer=None, reason='pinned'):
+        if mode not in ('serial', 'thread', 'process'):
+            raise ValueError("unknown mode {!r}".format(mode))
+        self.mode = mode
+        self.workers = workers
+        self.chunksize = chunksize
+        self.item_time = item_time
+        self.cpu_ratio = cpu_ratio
+        self.transfer = transfer
+        self.reason = reason
+
+    def __repr__(self):
+        return "Plan({})".format(", ".join(
+            "{}={!r}".format(name, getattr(self, name)) for name in self.__slots__))
+
+
+def _pickled_size(obj):
+    """Return the size of the pickled obj, or None if it can't be pickled"""
+    try:
+        return len(pickle.dumps(obj))
+    except Exception:
+        return None
+
+
+def _choose(item_time, cpu_ratio, transfer, remaining, cpus):
+    """Return the plan for items that take item_time s, cpu_ratio of it on
+    the CPU, and transfer bytes to and from a process (None if they can't be
+    pickled). remaining is the number of items left, or None if unknown."""
+    measures = dict(item_time=item_time, cpu_ratio=cpu_ratio, transfer=transfer)
+    if remaining is not None and item_time * remaining < _MIN_PARALLEL_WORK:
+        return Plan('serial', reason='too little work', **measures)
+    if cpu_ratio < _IO_RATIO:
+        # while an item waits, (1 - cpu_ratio) / cpu_ratio others can run
+        workers = max(2, min(32, int(cpus / max(cpu_ratio, 1 / 32))))
+        chunksize = max(1, int(_THREAD_TASK_TIME / item_time))
+        return Plan('thread', workers, chunksize, reason='I/O bound', **measures)
+    if cpus < 2:
+        return Plan('serial', reason='CPU bound, one CPU', **measures)
+    if transfer is None:
+        return Plan('serial', reason='CPU bound, not picklable', **measures)
+    if transfer * _BYTE_TIME >= item_time:
+        return Plan('serial', reason='CPU bound, transfer dominates', **measures)
+    chunksize = max(1, int(_PROCESS_TASK_TIME / item_time))
+    return Plan('process', cpus, chunksize, reason='CPU bound', **measures)
+
+
+def _apply_chunk(func, chunk):
+    return [func(*args) for args in chunk]
+
+
+def _prefetched(executor, func, args_iterator, ahead, ordered):
+    """Yield the results of func on the args, keeping at most ahead calls
+    submitted ahead of the consumer, in order or as completed. The executor
+    is shut down when the generator is exhausted or closed."""
+    pending = deque()
+    try:
+        for args in islice(args_iterator, ahead):
+            pending.append(executor.submit(func, *args))
+        while pending:
+            if ordered:
+                future = pending.popleft()
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                future = next(f for f in pending if f in done)
+                pending.remove(future)
+            result = future.result()
+            for args in islice(args_iterator, 1):
+                pending.append(executor.submit(func, *args))
+            yield result
+    finally:
+        # every submitted call is pending: no call is queued after this
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+
+def _pool_map(executor_class, workers, func, args_iterator, chunksize):
+    """Yield the results of func on the args, by chunks, in order, with at
+    most two chunks per worker submitted ahead of the consumer. The pool is
+    created on the first `next`."""
+    chunks = iter(lambda: list(islice(args_iterator, chunksize)), [])
+    for results in _prefetched(executor_class(workers), _apply_chunk,
+                               ((func, chunk) for chunk in chunks), 2 * workers, True):
+        yield from results
+
+
+def thread_imap(func, *iterables, ahead=8, workers=None, ordered=True):
+    """A lazy map for the I/O bound functions: a thread pool of workers
+    threads (default: ahead) keeps up to ahead calls in flight, ahead of the
+    consumer. The results are yielded in order, or as completed if not
+    ordered. The iterables may be infinite: closing the iterator (or
+    dropping it) cancels the pending calls and shuts the pool down.
+
+    >>> import time
+    >>> def fetch(x):
+    ...     time.sleep(0.01)
+    ...     return x * 2
+    >>> start = time.perf_counter()
+    >>> list(thread_imap(fetch, range(40), ahead=20))[-3:]
+    [74, 76, 78]
+    >>> time.perf_counter() - start < 0.2
+    True
+    >>> from itertools import count, islice
+    >>> list(islice(thread_imap(fetch, count()), 3))
+    [0, 2, 4]
+    """
+    return _lazy_prefetched(func, zip(*iterables), ahead, workers or ahead, ordered)
+
+
+def _lazy_prefetched(func, args_iterator, ahead, workers, ordered):
+    # a generator: the pool is created on the first `next`
+    yield from _prefetched(ThreadPoolExecutor(workers), func, args_iterator,
+                           ahead, ordered)
+
+
+def _first_match(func, chunk):
+    """Return the index of the first value of the chunk that matches func, or
+    None"""
+    for i, value in enumerate(chunk):
+        if func(value):
+            return i
+    return None
+
+
+def _matched(future):
+    return future.done() and not future.cancelled() and future.exception() is None \
+        and future.result() is not None
+
+
+def speculative_find_first(func, iterable, workers=None, mode='thread', chunksize=1):
+    """Same as `find_first_iter(func, iterable)`, with func called on the
+    values in a pool of workers (default: the number of CPUs) threads or
+    processes, by chunks of chunksize values. At most two chunks per worker
+    are submitted ahead of the first unresolved value.
+
+    When a chunk matches, the chunks after it are cancelled and no more
+    values are read; the result is the first match in the order of the
+    iterable, as with `find_first`. An exception raised by func before the
+    first match is raised; after the first match, it is ignored. The calls
+    that are already running when the result is known are not interrupted;
+    in process mode, they are waited for.
+
+    >>> import time
+    >>> def slow_odd(x):
+    ...     time.sleep(0.05)
+    ...     return x % 2 == 1
+    >>> start = time.perf_counter()
+    >>> speculative_find_first(lambda x: slow_odd(x) and x > 6, range(20), workers=8)
+    7
+    >>> time.perf_counter() - start < 0.3
+    True
+    >>> speculative_find_first(slow_odd, [0, 2, 4]) is None
+    True
+    """
+    if mode == 'thread':
+        executor_class = ThreadPoolExecutor
+    elif mode == 'process':
+        executor_class = ProcessPoolExecutor
+    else:
+        raise ValueError("unknown mode: {!r}".format(mode))
+    workers = workers or os.cpu_count() or 1
+    iterator = iter(iterable)
+    chunks = iter(lambda: list(islice(iterator, chunksize)), [])
+    executor = executor_class(workers)
+    pending = deque()  # (future, chunk), in the order of the iterable
+
+    def submit(n):
+        for chunk in islice(chunks, n):
+            pending.append((executor.submit(_first_match, func, chunk), chunk))
+
+    try:
+        submit(2 * workers)
+        matched = False
+        while pending:
+            if matched:
+                # only the chunks before the match may change the result
+                wait([pending[0][0]])
+            else:
+                # the done chunks behind the head would return at once
+                wait([future for future, _ in pending if not future.done()],
+                     return_when=FIRST_COMPLETED)
+            while pending and pending[0][0].done():
+                future, chunk = pending.popleft()
+                i = future.result()
+                if i is not None:
+                    return chunk[i]
+                if not matched:
+                    submit(1)
+            # a later chunk matched: the chunks after it are useless
+            k = next((k for k, (future, _) in enumerate(pending) if _matched(future)), None)
+            if k is not None:
+                matched = True
+                while len(pending) > k + 1:
+                    pending.pop()[0].cancel()
+        return None
+    finally:
+        # every submitted chunk is pending or done. The running chunks of a
+        # process pool are waited for: before Python 3.9, a process pool
+        # shut down without waiting may block the exit of the interpreter
+        for future, _ in pending:
+            future.cancel()
+        executor.shutdown(wait=executor_class is ProcessPoolExecutor)
+
+
+def _remaining(iterables, consumed):
+    try:
+        return min(map(len, iterables)) - consumed
+    except TypeError:
+        return None
+
+
+class AdaptiveMap:
+    """A lazy map of func that chooses its `Plan` on the first `next`, and
+    keeps it.
+    With a plan (or a mode), the plan is pinned. workers is the number of
+    CPUs to consider (default: `os.cpu_count()`)."""
+    def __init__(self, func, plan=None, workers=None, sample=_SAMPLE_SIZE):
+        self.func = func
+        self.plan = Plan(plan) if isinstance(plan, str) else plan
+        self.workers = workers
+        self.sample = sample
+
+    def __call__(self, *iterables):
+        func = self.func
+        args_iterator = zip(*iterables)
+        if self.plan is None:
+            results, self.plan = self._sample(args_iterator, iterables)
+            yield from results
+        plan = self.plan
+        if plan.mode == 'serial':
+            for args in args_iterator:
+                yield func(*args)
+            return
+        workers = plan.workers or self.workers or os.cpu_count() or 1
+        executor_class = ThreadPoolExecutor if plan.mode == 'thread' else ProcessPoolExecutor
+        yield from _pool_map(executor_class, workers, func, args_iterator, plan.chunksize)
+
+    def _sample(self, args_iterator, iterables):
+        """Call func on the first items: return the results and the plan"""
+        func = self.func
+        results = []
+        transfer = None
+        wall = cpu = 0.0
+        for args in islice(args_iterator, self.sample):
+            start, start_cpu = perf_counter(), thread_time()
+            result = func(*args)
+            wall += perf_counter() - start
+            cpu += thread_time() - start_cpu
+            if not results:
+                size = _pickled_size((func, args, result))
+                transfer = size and size - (_pickled_size(func) or 0)
+            results.append(result)
+            if wall > _SAMPLE_TIME:
+                break
+        if not results:
+            return results, Plan('serial', reason='no item')
+        item_time = max(wall / len(results), 1e-9)
+        cpu_ratio = min(cpu / wall, 1.0) if wall else 1.0
+        plan = _choose(item_time, cpu_ratio, transfer,
+                       _remaining(iterables, len(results)),
+                       self.workers or os.cpu_count() or 1)
+        return results, plan
+
+
+def adaptive_map(func, *iterables, plan=None, workers=None):
+    """A lazy and ordered map that runs serially, in threads or in processes,
+    as an `AdaptiveMap`. Closing the iterator shuts the pool down."""
+    return AdaptiveMap(func, plan, workers)(*iterables)
+
+
+_DONE = object()
+# The period of the checks of the stop flag by a blocked thread, in s
+_POLL = 0.05
+
+
+class Stage:
+    """A stage of a `StagedDot`: func is called by workers threads, or by
+    workers processes if mode is 'process' (func must be picklable). If
+    ordered, the stage passes its results on in the order of the input."""
+    __slots__ = ('func', 'workers', 'mode', 'ordered')
+
+    def __init__(self, func, workers=1, mode='thread', ordered=True):
+        if mode not in ('thread', 'process'):
+            raise ValueError("unknown mode {!r}".format(mode))
+        self.func = func
+        self.workers = workers
+        self.mode = mode
+        self.ordered = ordered
+
+    def __repr__(self):
+        return "Stage({!r}, workers={}, mode={!r}, ordered={})".format(
+            self.func, self.workers, self.mode, self.ordered)
+
+
+class _Run:
+    """The threads and queues of one call of a `StagedDot`. The items are
+    (index, value) pairs; queues[k] is the input of the k-th stage in the
+    order of application, and queues[-1] is the output."""
+    def __init__(self, stages, maxsize):
+        self.stages = stages
+        self.maxsize = maxsize
+        self.queues = [queue.Queue(maxsize) for _ in range(len(stages) + 1)]
+        self.stop = threading.Event()
+        self.error = None
+        self.lock = threading.Lock()
+        self.threads = []
+        self.pools = []
+
+    def fail(self, error):
+        with self.lock:
+            if self.error is None:
+                self.error = error
+        self.stop.set()
+
+    def put(self, q, item):
+        """Put the item, unless the run is stopped: return False if so"""
+        while not self.stop.is_set():
+            try:
+                q.put(item, timeout=_POLL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def get(self, q):
+        """Return the next item, or _DONE if the run is stopped"""
+        while not self.stop.is_set():
+            try:
+                return q.get(timeout=_POLL)
+            except queue.Empty:
+                pass
+        return _DONE
+
+    def start(self, iterable):
+        for k, stage in enumerate(self.stages):
+            call = stage.func
+            if stage.mode == 'process':
+                pool = ProcessPoolExecutor(stage.workers)
+                self.pools.append(pool)
+                call = _remote(pool, stage.func)
+            # shared by the workers of the stage; a worker that waits for
+            # room in the next queue keeps the lock, but only blocks its stage.
+            # computing holds the indices of the calls in progress
+            state = {'running': stage.workers, 'next': 0, 'pending': {},
+                     'computing': set(), 'window': self.maxsize + stage.workers,
+                     'cond': threading.Condition()}
+            for _ in range(stage.workers):
+                self._spawn(self._work, k, call, stage.ordered, state)
+        self._spawn(self._feed, iterable)
+
+    def _spawn(self, target, *args):
+        thread = threading.Thread(target=target, args=args, daemon=True)
+        self.threads.append(thread)
+        thread.start()
+
+    def _feed(self, iterable):
+        try:
+            for item in enumerate(iterable):
+                if not self.put(self.queues[0], item):
+                    return
+        except BaseException as e:
+            self.fail(e)
+            return
+        for _ in range(self.stages[0].workers):
+            self.put(self.queues[0], _DONE)
+
+    def _wait_for_room(self, state):
+        """Block an ordered worker while too many results wait for the next
+        one, as long as the next one is being computed by the stage: if it
+        is not taken yet (an unordered stage upstream), the workers must go
+        on to take it"""
+        with state['cond']:
+            while (len(state['pending']) >= state['window'] and not self.stop.is_set()
+                   and state['next'] in state['computing']):
+                state['cond'].wait(_POLL)
+
+    def _work(self, k, call, ordered, state):
+        source, target = self.queues[k], self.queues[k + 1]
+        cond = state['cond']
+        while True:
+            if ordered:
+                self._wait_for_room(state)
+            item = self.get(source)
+            if item is _DONE:
+                break
+            i, value = item
+            if ordered:
+                with cond:
+                    state['computing'].add(i)
+            try:
+                value = call(value)
+            except BaseException as e:
+                self.fail(e)
+                return
+            if not ordered:
+                self.put(target, (i, value))
+                continue
+            with cond:
+                state['computing'].discard(i)
+                pending = state['pending']
+                pending[i] = value
+                while state['next'] in pending:
+                    self.put(target, (state['next'], pending.pop(state['next'])))
+                    state['next'] += 1
+                cond.notify_all()
+        with cond:
+            state['running'] -= 1
+            last = state['running'] == 0
+        if last:
+            successors = self.stages[k + 1].workers if k + 1 < len(self.stages) else 1
+            for _ in range(successors):
+                self.put(target, _DONE)
+
+    def results(self, iterable):
+        try:
+            self.start(iterable)
+            while True:
+                item = self.get(self.queues[-1])
+                if item is _DONE:
+                    break
+                yield item[1]
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.stop.set()
+            for thread in self.threads:
+                thread.join()
+            for pool in self.pools:
+                # the workers are joined: no call is left in the pool
+                pool.shutdown(wait=True)
+
+
+def _remote(pool, func):
+    def call(value):
+        return pool.submit(func, value).result()
+    return call
+
+
+class StagedDot:
+    """A `dot` whose stages run concurrently: `StagedDot(write, parse,
+    fetch)(urls)` fetches, parses and writes the urls as a lazy iterator.
+    A stage is a function (one thread) or a `Stage`. Every queue between two
+    stages holds at most maxsize items, and an ordered stage keeps about
+    maxsize + workers results waiting for a slower item. The first exception of a stage stops
+    the run and is raised by the iterator; closing the iterator stops the
+    run too. The threads start on the first `next`.
+
+    >>> import time
+    >>> def fetch(x):
+    ...     time.sleep(0.01)
+    ...     return x
+    >>> start = time.perf_counter()
+    >>> list(StagedDot(str, Stage(fetch, workers=10))(range(20)))[-3:]
+    ['17', '18', '19']
+    >>> time.perf_counter() - start < 0.1
+    True
+    """
+    def __init__(self, *stages, maxsize=16):
+        # the last stage is applied first
+        self.stages = [stage if isinstance(stage, Stage) else Stage(stage)
+                       for stage in reversed(stages)]
+        self.maxsize = maxsize
+
+    def __call__(self, iterable):
+        if not self.stages:
+            return iter(iterable)
+        return _Run(self.stages, self.maxsize).results(iterable)
@@ -0,0 +1,546 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Record sources: read a file as bytes records, without the text layer.
+
+`MmapSource(path)` maps the file in memory and yields its lines (or the
+records delimited by any separator) as `bytes`. The file is cut by large
+chunks, and each chunk is split in one call: the loop per record stays in C.
+`bsplit1` is the `split1` for these records, that decodes only the fields
+that are used.
+
+    >>> import tempfile
+    >>> with tempfile.NamedTemporaryFile("wb", suffix=".txt", delete=False) as f:
+    ...     _ = f.write(b"a=1\\nb=2\\n")
+    >>> with MmapSource(f.name) as source:
+    ...     dict(map(bsplit1(b'='), source))
+    {'a': '1', 'b': '2'}
+    >>> import os; os.remove(f.name)
+
+`KVParser` parses whole buffers of `k=v,k=v` records: the loop per field of
+the `dict(map(split1('='), record.split(',')))` idiom is replaced by a few
+`str` methods per record.
+
+`JsonlSource`/`CsvSource` read the records of a JSONL/CSV file lazily, by
+batches, and `JsonlSink`/`CsvSink` write them with one large write per batch.
+A pipeline from a file to a file runs in bounded memory:
+
+    >>> from yamft import dget, group_agg
+    >>> with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as f:
+    ...     _ = f.write('{"id": 1, "val": 2, "x": "..."}\\n{"id": 1, "val": 3}\\n')
+    >>> with JsonlSink(f.name + ".out") as sink:
+    ...     sink.write_all(JsonlSource(f.name, fields=[dget('id'), dget('val')]))
+    2
+    >>> list(JsonlSource(f.name + ".out"))
+    [{'id': 1, 'val': 2}, {'id': 1, 'val': 3}]
+    >>> group_agg(dget('id'), JsonlSource(f.name), sum=dget('val'))
+    {1: {'sum': 5}}
+    >>> os.remove(f.name); os.remove(f.name + ".out")
+"""
+
+__all__ = ['MmapSource', 'bsplit1', 'KVParser', 'JsonlSource', 'CsvSource', 'JsonlSink',
+           'CsvSink']
+
+import csv
+import json
+import mmap
+import re
+from itertools import islice
+from operator import itemgetter
+
+from yamft import Combinator
+from yamft.operator import dget
+
+_CHUNK_SIZE = 1 << 20
+
+
+class MmapSource:
+    """The records of a file, delimited by sep (without the separator). The
+    iterator yields `bytes`; `views()` yields `memoryview` slices of the map,
+    without any copy (but with a Python loop per record). The views may be
+    kept after the source is closed: the map is then unmapped when the last
+    view is released or collected.
+
+    The source is a context manager; an iterator closes the map when it is
+    exhausted, if the source is not used in a `with` statement."""
+    def __init__(self, path, sep=b'\n', chunk_size=_CHUNK_SIZE):
+        if not sep:
+            raise ValueError("empty separator")
+        self.path = path
+        self.sep = sep
+        self.chunk_size = chunk_size
+        self._mm = None
+        self._entered = False
+
+    def __enter__(self):
+        self._entered = True
+        self._open()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._entered = False
+        self.close()
+
+    def _open(self):
+        """Return the map, or None if the file is empty (an empty file can't
+        be mapped)"""
+        if self._mm is None:
+            with open(self.path, 'rb') as f:
+                f.seek(0, 2)
+                if f.tell():
+                    self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mm
+
+    def close(self):
+        mm, self._mm = self._mm, None
+        if mm is not None:
+            try:
+                mm.close()
+            except BufferError:  # views are alive: they keep the map
+                pass
+
+    def chunks(self):
+        """Yield the chunks of the file: `bytes` of about chunk_size bytes,
+        that end with a separator, or at the end of the file"""
+        mm = self._open()
+        if mm is None:
+            return
+        try:
+            sep, size, end = self.sep, self.chunk_size, len(mm)
+            pos = 0
+            while pos < end:
+                stop = pos + size
+                if stop < end:
+                    i = mm.rfind(sep, pos, stop)
+                    if i == -1:  # a record longer than a chunk
+                        i = mm.find(sep, stop)
+                    stop = end if i == -1 else i + len(sep)
+                else:
+                    stop = end
+                yield mm[pos:stop]
+                pos = stop
+        finally:
+            if not self._entered:
+                self.close()
+
+    def __iter__(self):
+        sep = self.sep
+        for chunk in self.chunks():
+            records = chunk.split(sep)
+            if chunk.endswith(sep):
+                records.pop()
+            yield from records
+
+    def views(self):
+        """Yield the records as `memoryview` slices of the map"""
+        mm = self._open()
+        if mm is None:
+            return
+        view = memoryview(mm)
+        try:
+            sep, find, end = self.sep, mm.find, len(mm)
+            pos = 0
+            while pos < end:
+                i = find(sep, pos)
+                if i == -1:
+                    i = end
+                yield view[pos:i]
+                pos = i + len(sep)
+        finally:
+            view.release()
+            if not self._entered:
+                self.close()
+
+
+class bsplit1(Combinator):
+    """Return a function r -> r.split(sep, maxsplits) for a bytes-like record,
+    with the fields decoded (unless encoding is None). If fields is set, only
+    these fields are split off and decoded. A memoryview record (e.g. from
+    `MmapSource.views()`) is copied once to `bytes`, since a memoryview can't
+    be searched: for short records, the copy and a `bytes.split` are faster
+    than a zero-copy split (a `re` search and a slice per field).
+
+    >>> bsplit1(b'=')(b'a=b=c'), bsplit1(b'=', 1)(memoryview(b'a=b=c'))
+    (['a', 'b', 'c'], ['a', 'b=c'])
+    >>> bsplit1(b',', fields=(2, 0))(b'x,y,z,t'), bsplit1(encoding=None)(b'a b')
+    (['z', 'x'], [b'a', b'b'])
+    """
+    __slots__ = ('sep', 'maxsplits', 'fields', 'encoding', '_maxsplits', '_str_sep', '_field')
+    _fields = ('sep', 'maxsplits', 'fields', 'encoding')
+    _doc = "Same as r.split({sep}, {maxsplits}), decoded."
+
+    def __init__(self, sep=None, maxsplits=-1, fields=None, encoding='utf-8'):
+        self.sep = sep
+        self.maxsplits = maxsplits
+        self.fields = fields
+        self.encoding = encoding
+        self._maxsplits = maxsplits
+        if fields and min(fields) >= 0:
+            # don't split the unused tail: it stays in the last part (a
+            # negative index needs the whole split)
+            needed = max(fields) + 1
+            if maxsplits < 0 or maxsplits > needed:
+                self._maxsplits = needed
+        # without fields, one decode of the record and a str split are
+        # cheaper than a decode per field
+        self._str_sep = None if sep is None or encoding is None else sep.decode(encoding)
+        self._field = fields[0] if fields is not None and len(fields) == 1 else None
+
+    def __call__(self, r):
+        if type(r) is memoryview:
+            r = r.tobytes()
+        fields = self.fields
+        encoding = self.encoding
+        if fields is None:
+            if encoding is None:
+                return r.split(self.sep, self._maxsplits)
+            return r.decode(encoding).split(self._str_sep, self._maxsplits)
+        parts = r.split(self.sep, self._maxsplits)
+        if self._field is not None:
+            field = parts[self._field]
+            return [field if encoding is None else field.decode(encoding)]
+        if encoding is None:
+            return [parts[i] for i in fields]
+        return [parts[i].decode(encoding) for i in fields]
+
+
+class KVParser:
+    """A parser of buffers of records `k1=v1,k2=v2`, one record per line. The
+    separators are configurable. converters is a function applied to every
+    value (as in `map_values`) or a dict key -> function; keys is the list of
+    the keys of the tuples and of the columns. A `bytes` buffer is decoded
+    at once.
+
+    The results follow the `either` convention: a malformed record, or a
+    value rejected by a converter, gives `(None, error)`.
+
+    >>> parser = KVParser(converters={'A': int})
+    >>> parser.dicts("A=5,B=x\\nA=y\\nA=1=2\\n")
+    [({'A': 5, 'B': 'x'}, None), (None, ValueError(...)), (None, ValueError(...))]
+    >>> parser.dicts("A=1=2,B")[0][1]
+    ValueError("record 0: malformed field 'A=1=2'")
+    >>> KVParser(keys=['B', 'A'], converters=int).tuples("A=5,B=7\\nA=6")
+    [((7, 5), None), ((None, 6), None)]
+    >>> KVParser(keys=['A', 'B'], converters=int).columns("A=5,B=7\\nA=6\\nA=?")
+    ({'A': [5, 6], 'B': [7, None]}, [(2, ValueError(...))])
+    """
+    def __init__(self, field_sep=',', kv_sep='=', record_sep='\n', converters=None,
+                 keys=None, encoding='utf-8'):
+        if len({field_sep, kv_sep, record_sep}) != 3:
+            raise ValueError("the separators must be distinct")
+        self.field_sep = field_sep
+        self.kv_sep = kv_sep
+        self.record_sep = record_sep
+        self.converters = converters
+        self.keys = keys
+        self.encoding = encoding
+        # a field with two key/value separators
+        seps = [field_sep, kv_sep, record_sep]
+        if all(len(sep) == 1 for sep in seps):
+            other = "[^{}]*".format("".join(map(re.escape, seps)))
+        else:
+            other = "(?:(?!{}).)*".format("|".join(map(re.escape, seps)))
+        self._double = re.compile(re.escape(kv_sep) + other + re.escape(kv_sep), re.DOTALL)
+
+    def _split(self, buffer):
+        """Return the records of the buffer, the records where the field
+        separators are replaced by key/value separators, and True if all the
+        records are well formed"""
+        if not isinstance(buffer, str):
+            buffer = str(buffer, self.encoding)
+        records = buffer.split(self.record_sep)
+        translated = buffer.replace(self.field_sep, self.kv_sep).split(self.record_sep)
+        if not records[-1]:
+            records.pop()
+            translated.pop()
+        # if no field has two separators, and there are as many separators as
+        # fields, every field has one separator
+        fields = buffer.count(self.field_sep) + len(records) - records.count('')
+        valid = buffer.count(self.kv_sep) == fields and not self._double.search(buffer)
+        return records, translated, valid
+
+    def _malformed(self, i, record):
+        kv_sep = self.kv_sep
+        for field in record.split(self.field_sep):
+            if field.count(kv_sep) != 1:
+                return ValueError("record {}: malformed field {!r}".format(i, field))
+
+    def _convert(self, d):
+        converters = self.converters
+        if converters is None:
+            return d
+        if callable(converters):
+            return {k: converters(v) for k, v in d.items()}
+        for k, convert in converters.items():
+            if k in d:
+                d[k] = convert(d[k])
+        return d
+
+    def _parse(self, buffer):
+        """Yield the either (dict, None) or (None, error) of every record"""
+        records, translated, valid = self._split(buffer)
+        field_sep, kv_sep, double = self.field_sep, self.kv_sep, self._double
+        convert = self._convert
+        for i, (record, parts) in enumerate(zip(records, translated)):
+            if not record:
+                yield {}, None
+                continue
+            if not valid and (record.count(kv_sep) != record.count(field_sep) + 1
+                              or double.search(record)):
+                yield None, self._malformed(i, record)
+                continue
+            it = iter(parts.split(kv_sep))
+            try:
+                yield convert(dict(zip(it, it))), None
+            except Exception as e:
+                yield None, e
+
+    def dicts(self, buffer):
+        """Return the list of the records as either dicts"""
+        return list(self._parse(buffer))
+
+    def _keys(self, method):
+        if self.keys is None:
+            raise ValueError("KVParser.{}() needs the keys: set keys=[...]".format(method))
+        return self.keys
+
+    def tuples(self, buffer):
+        """Return the list of the records as either tuples of the values of
+        the keys (None if a key is missing)"""
+        keys = self._keys('tuples')
+        return [(None, e) if e is not None else (tuple(map(d.get, keys)), None)
+                for d, e in self._parse(buffer)]
+
+    def columns(self, buffer):
+        """Return a dict key -> list of the values of the valid records (None
+        if a key is missing), and the list of the (index, error) of the other
+        records"""
+        columns = {k: [] for k in self._keys('columns')}
+        errors = []
+        for i, (d, e) in enumerate(self._parse(buffer)):
+            if e is not None:
+                errors.append((i, e))
+                continue
+            for k, column in columns.items():
+                column.append(d.get(k))
+        return columns, errors
+
+
+_BATCH_SIZE = 1024
+# raw_decode, unlike json.loads, doesn't check the type of its argument
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _field_names(fields):
+    """Return the keys of the fields, given as keys or as `dget` accessors"""
+    if fields is None:
+        return None
+    return [field.k if isinstance(field, dget) else field for field in fields]
+
+
+class JsonlSource:
+    """The records of a JSONL file, one JSON value per line; the blank lines
+    are skipped. The file is read lazily, by batches of batch_size lines,
+    and every line is decoded by the same `json.JSONDecoder`.
+
+    If fields (keys or `dget` accessors) is set, the records are dicts with
+    only these fields: the rest of the record is dropped as soon as the batch
+    is decoded."""
+    def __init__(self, path, fields=None, batch_size=_BATCH_SIZE, buffer_size=_CHUNK_SIZE,
+                 encoding='utf-8'):
+        self.path = path
+        self.fields = fields
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+
+    @staticmethod
+    def _decode(lines, first):
+        """Return the values of the lines, the first one being the line first
+        of the file"""
+        decode = _JSON_DECODER.raw_decode
+        records = []
+        for i, line in enumerate(lines, first):
+            try:
+                try:
+                    record, end = decode(line)
+                except ValueError:  # a blank line, leading whitespace or an error
+                    line = line.strip()
+                    if not line:
+                        continue
+                    record, end = decode(line)
+                if end != len(line) and not line[end:].isspace():
+                    raise ValueError("Extra data: column {}".format(end + 1))
+            except ValueError as e:
+                raise ValueError("line {}: {}".format(i, e)) from None
+            records.append(record)
+        return records
+
+    def batches(self):
+        """Yield the lists of the records"""
+        names = _field_names(self.fields)
+        with open(self.path, encoding=self.encoding, buffering=self.buffer_size) as f:
+            first = 1
+            while True:
+                lines = list(islice(f, self.batch_size))
+                if not lines:
+                    return
+                records = self._decode(lines, first)
+                if names is not None:
+                    records = [{k: r[k] for k in names if k in r} for r in records]
+                yield records
+                first += len(lines)
+
+    def __iter__(self):
+        for records in self.batches():
+            yield from records
+
+
+class CsvSource:
+    """The records of a CSV file with a header, as dicts. The file is read
+    lazily, by batches of batch_size rows. fmtparams are passed to
+    `csv.reader`.
+
+    If fields (keys or `dget` accessors) is set, only these columns are put
+    in the dicts. As with `csv.DictReader`, the values are strings; a short
+    row gives a dict without the missing fields."""
+    def __init__(self, path, fields=None, batch_size=_BATCH_SIZE, buffer_size=_CHUNK_SIZE,
+                 encoding='utf-8', **fmtparams):
+        self.path = path
+        self.fields = fields
+        self.batch_size = batch_size
+        self.buffer_size = buffer_size
+        self.encoding = encoding
+        self.fmtparams = fmtparams
+
+    def batches(self):
+        """Yield the lists of the records"""
+        with open(self.path, encoding=self.encoding, newline='',
+                  buffering=self.buffer_size) as f:
+            reader = csv.reader(f, **self.fmtparams)
+            header = next(reader, None)
+            if header is None:
+                return
+            names = _field_names(self.fields)
+            if names is None:
+                names, indices = header, None
+            else:
+                missing = set(names) - set(header)
+                if missing:
+                    raise ValueError("unknown fields: {}".format(sorted(missing, key=str)))
+                indices = [header.index(name) for name in names]
+                # an itemgetter with one index returns the field, not a tuple
+                get = itemgetter(*indices) if len(indices) > 1 else lambda row: (row[indices[0]],)
+            while True:
+                rows = list(islice(reader, self.batch_size))
+                if not rows:
+                    return
+                if indices is None:
+                    yield [dict(zip(names, row)) for row in rows]
+                    continue
+                try:
+                    yield [dict(zip(names, get(row))) for row in rows]
+                except IndexError:  # a short row
+                    yield [{name: row[i] for name, i in zip(names, indices) if i < len(row)}
+                           for row in rows]
+
+    def __iter__(self):
+        for records in self.batches():
+            yield from records
+
+
+class _Sink:
+    """A file written by batches: `write` stores the record, and the batch is
+    written when it is full, or when the sink is closed"""
+    def __init__(self, path, batch_size, buffer_size, encoding):
+        self.path = path
+        self.batch_size = batch_size
+        self._file = open(path, 'w', encoding=encoding, newline='', buffering=buffer_size)
+        self._pending = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, record):
+        pending = self._pending
+        pending.append(record)
+        if len(pending) >= self.batch_size:
+            self.write_batch(pending)
+            self._pending = []
+
+    def write_all(self, records):
+        """Write the records, by batches, and return their number"""
+        self.flush()
+        count = 0
+        it = iter(records)
+        while True:
+            batch = list(islice(it, self.batch_size))
+            if not batch:
+                return count
+            self.write_batch(batch)
+            count += len(batch)
+
+    def flush(self):
+        if self._pending:
+            self.write_batch(self._pending)
+            self._pending = []
+
+    def close(self):
+        if not self._file.closed:
+            try:
+                self.flush()
+            finally:
+                self._file.close()
+
+
+class JsonlSink(_Sink):
+    """A JSONL file, written by batches: every batch is encoded as one string
+    and written at once. dumps_kwargs are passed to `json.JSONEncoder`."""
+    def __init__(self, path, batch_size=_BATCH_SIZE, buffer_size=_CHUNK_SIZE, encoding='utf-8',
+                 **dumps_kwargs):
+        super().__init__(path, batch_size, buffer_size, encoding)
+        self._encode = json.JSONEncoder(**dumps_kwargs).encode
+
+    def write_batch(self, records):
+        if records:
+            self._file.write("\n".join(map(self._encode, records)) + "\n")
+
+
+class CsvSink(_Sink):
+    """A CSV file with a header, written by batches of dicts. If fieldnames
+    is None, the keys of the first record are the fieldnames. fmtparams are
+    passed to `csv.DictWriter` (e.g. `extrasaction='ignore'`)."""
+    def __init__(self, path, fieldnames=None, batch_size=_BATCH_SIZE, buffer_size=_CHUNK_SIZE,
+                 encoding='utf-8', **fmtparams):
+        super().__init__(path, batch_size, buffer_size, encoding)
+        self.fieldnames = fieldnames
+        self._fmtparams = fmtparams
+        self._writer = None
+
+    def write_batch(self, records):
+        if not records:
+            return
+        if self._writer is None:
+            if self.fieldnames is None:
+                self.fieldnames = list(records[0])
+            self._writer = csv.DictWriter(self._file, self.fieldnames, **self._fmtparams)
+            self._writer.writeheader()
+        self._writer.writerows(records)
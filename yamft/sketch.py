@@ -0,0 +1,398 @@
+#  YAMFT - Yet another more-functools
+#
+#  Copyright (C) 2019 J. Férard <https://github.com/jferard>
+#
+#  This file is part of YAMFT.
+#
+#  YAMFT is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  YAMFT is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""Approximate aggregations: sketches that summarize a stream in a bounded
+memory, with a known error bound.
+
+Every sketch has an `add(value)` method and a `merge(other)` method. Both
+modify the sketch in place and return it, so that sketches can be used as
+accumulators:
+
+* in a `group_agg`, through `sketch_agg`;
+* in a `list2dict`, to merge the sketches built by parallel workers:
+  `list2dict(HyperLogLog.merge, items)`.
+
+Values are hashed with a stable hash (not the builtin `hash`, that is salted
+per process), hence sketches built in different processes can be merged.
+"""
+
+__all__ = ['HyperLogLog', 'CountMin', 'MisraGries', 'KLL', 'sketch_agg']
+
+import hashlib
+import math
+import random
+from array import array
+
+from yamft import ident
+
+
+def _to_bytes(value):
+    if isinstance(value, bytes):
+        return b'b' + value
+    elif isinstance(value, str):
+        return b's' + value.encode('utf-8')
+    else:
+        return b'r' + repr(value).encode('utf-8')
+
+
+def _hash128(value):
+    """Return a stable 128 bits hash of the value, as two 64 bits ints"""
+    digest = hashlib.blake2b(_to_bytes(value), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little')
+
+
+def _check_mergeable(sketch, other, *attrs):
+    if type(sketch) is not type(other) or any(
+            getattr(sketch, a) != getattr(other, a) for a in attrs):
+        raise ValueError(f"can't merge {other!r} into {sketch!r}")
+
+
+def sketch_agg(factory, extractor=ident, finish=ident):
+    """Return a `(start, step, finish)` aggregate for `group_agg`. `factory`
+    builds an empty sketch, `extractor` extracts the value to add from
+    the element and `finish` turns the sketch into a result.
+
+    >>> from yamft import group_agg, dget, mod1
+    >>> rows = [{'user': u, 'session': s % (u + 1)} for u in range(3) for s in range(10)]
+    >>> group_agg(dget('user'), rows, sessions=sketch_agg(HyperLogLog, dget('session'), len))
+    {0: {'sessions': 1}, 1: {'sessions': 2}, 2: {'sessions': 3}}
+    """
+    def start(element):
+        return factory().add(extractor(element))
+
+    def step(sketch, element):
+        return sketch.add(extractor(element))
+
+    return start, step, finish
+
+
+class HyperLogLog:
+    """Count the distinct values of a stream. The relative standard error is
+    `error`, and the sketch uses about `(1.04 / error) ** 2` bytes.
+
+    >>> hll = HyperLogLog(error=0.01)
+    >>> for i in range(100000):
+    ...     _ = hll.add(i % 30000)
+    >>> abs(len(hll) - 30000) < 30000 * 0.03
+    True
+    >>> hll.error < 0.01
+    True
+
+    Merge the sketches of two workers:
+
+    >>> h1 = HyperLogLog().update(range(0, 600))
+    >>> h2 = HyperLogLog().update(range(400, 1000))
+    >>> abs(len(h1.merge(h2)) - 1000) < 30
+    True
+    """
+    __slots__ = ('p', 'm', 'registers')
+
+    def __init__(self, error=0.01, p=None):
+        if p is None:
+            p = math.ceil(math.log2((1.04 / error) ** 2))
+        if not 4 <= p <= 18:
+            raise ValueError(f"precision {p} is out of range [4, 18]")
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    @property
+    def error(self):
+        """The relative standard error"""
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value):
+        h, _ = _hash128(value)
+        index = h >> (64 - self.p)
+        rank = (64 - self.p) - (h & ((1 << (64 - self.p)) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+        return self
+
+    def update(self, iterable):
+        for value in iterable:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        _check_mergeable(self, other, 'p')
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / math.fsum(2.0 ** -r for r in self.registers)
+        if estimate <= 2.5 * m:
+            zeros = self.registers.count(0)
+            if zeros:
+                estimate = m * math.log(m / zeros)
+        return estimate
+
+    def __len__(self):
+        return round(self.count())
+
+    def __repr__(self):
+        return f"HyperLogLog(p={self.p})"
+
+
+class CountMin:
+    """Estimate the frequency of the values of a stream. The estimate is never
+    lower than the true count, and exceeds it by more than `epsilon * total`
+    with a probability lower than `delta`.
+
+    >>> cm = CountMin(epsilon=0.001, delta=0.01)
+    >>> for i in range(10000):
+    ...     _ = cm.add(i % 100 if i % 2 else 'hot')
+    >>> cm['hot']
+    5000
+    >>> 100 <= cm[1] <= 100 + cm.epsilon * cm.total
+    True
+    """
+    __slots__ = ('width', 'depth', 'total', 'table')
+
+    def __init__(self, epsilon=0.001, delta=0.01):
+        self.width = math.ceil(math.e / epsilon)
+        self.depth = math.ceil(math.log(1 / delta))
+        self.total = 0
+        self.table = [array('Q', bytes(8 * self.width)) for _ in range(self.depth)]
+
+    @property
+    def epsilon(self):
+        return math.e / self.width
+
+    @property
+    def delta(self):
+        return math.exp(-self.depth)
+
+    def _indices(self, value):
+        h1, h2 = _hash128(value)
+        width = self.width
+        return ((h1 + i * h2) % width for i in range(self.depth))
+
+    def add(self, value, count=1):
+        for row, index in zip(self.table, self._indices(value)):
+            row[index] += count
+        self.total += count
+        return self
+
+    def update(self, iterable):
+        for value in iterable:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        _check_mergeable(self, other, 'width', 'depth')
+        for row, other_row in zip(self.table, other.table):
+            for i, c in enumerate(other_row):
+                if c:
+                    row[i] += c
+        self.total += other.total
+        return self
+
+    def __getitem__(self, value):
+        return min(row[index] for row, index in zip(self.table, self._indices(value)))
+
+    def __repr__(self):
+        return f"CountMin(width={self.width}, depth={self.depth})"
+
+
+class MisraGries:
+    """Find the heavy hitters of a stream with `k - 1` counters. Every value
+    that occurs more than `total / k` times is kept, and the count of a value
+    is underestimated by at most `total / k`.
+
+    >>> mg = MisraGries(k=10)
+    >>> for i in range(10000):
+    ...     _ = mg.add('a' if i % 3 == 0 else 'b' if i % 5 == 0 else str(i))
+    >>> sorted(mg.heavy_hitters(0.12))
+    ['a', 'b']
+    >>> mg['a'] <= 3334 <= mg['a'] + mg.error * mg.total
+    True
+
+    >>> m1 = MisraGries(k=4).update("aaabbc")
+    >>> m2 = MisraGries(k=4).update("aaaccd")
+    >>> m1.merge(m2).heavy_hitters(0.5)
+    {'a': 5}
+    """
+    __slots__ = ('k', 'total', 'counters')
+
+    def __init__(self, k=100):
+        if k < 2:
+            raise ValueError("k must be at least 2")
+        self.k = k
+        self.total = 0
+        self.counters = {}
+
+    @property
+    def error(self):
+        """The maximal underestimation of a count, relative to the total"""
+        return 1 / self.k
+
+    def add(self, value):
+        counters = self.counters
+        self.total += 1
+        if value in counters:
+            counters[value] += 1
+        elif len(counters) < self.k - 1:
+            counters[value] = 1
+        else:
+            self.counters = {v: c - 1 for v, c in counters.items() if c > 1}
+        return self
+
+    def update(self, iterable):
+        for value in iterable:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        _check_mergeable(self, other, 'k')
+        counters = dict(self.counters)
+        for v, c in other.counters.items():
+            counters[v] = counters.get(v, 0) + c
+        if len(counters) >= self.k:
+            kth = sorted(counters.values(), reverse=True)[self.k - 1]
+            counters = {v: c - kth for v, c in counters.items() if c > kth}
+        self.counters = counters
+        self.total += other.total
+        return self
+
+    def __getitem__(self, value):
+        return self.counters.get(value, 0)
+
+    def heavy_hitters(self, threshold=None):
+        """Return the values whose estimated frequency (relative to the total)
+        may exceed `threshold`, with their (under)estimated counts."""
+        if threshold is None:
+            threshold = self.error
+        limit = (threshold - self.error) * self.total
+        return {v: c for v, c in self.counters.items() if c > limit}
+
+    def __repr__(self):
+        return f"MisraGries(k={self.k})"
+
+
+class KLL:
+    """Estimate the quantiles of a stream. The rank error is lower than
+    `epsilon` with a high probability, and the sketch stores
+    `O(1 / epsilon)` values.
+
+    >>> kll = KLL(epsilon=0.01, seed=1)
+    >>> for i in range(100000):
+    ...     _ = kll.add((i * 7919) % 100000)
+    >>> abs(kll.quantile(0.5) - 50000) < 100000 * 0.01
+    True
+    >>> abs(kll.rank(25000) - 0.25) < 0.01
+    True
+    >>> len(kll.values()) < 2000
+    True
+
+    >>> k1 = KLL(seed=1).update(range(0, 5000))
+    >>> k2 = KLL(seed=2).update(range(5000, 10000))
+    >>> abs(k1.merge(k2).quantile(0.9) - 9000) < 10000 * k1.epsilon
+    True
+    """
+    __slots__ = ('k', 'total', 'compactors', '_random')
+
+    _C = 2 / 3
+
+    def __init__(self, epsilon=0.01, k=None, seed=None):
+        if k is None:
+            k = math.ceil((2.296 / epsilon) ** (1 / 0.9723))
+        self.k = max(k, 8)
+        self.total = 0
+        self.compactors = [[]]
+        self._random = random.Random(seed)
+
+    @property
+    def epsilon(self):
+        """The normalized rank error, for a 99% confidence"""
+        return 2.296 / self.k ** 0.9723
+
+    def _capacity(self, level):
+        height = len(self.compactors)
+        return max(2, math.ceil(self.k * self._C ** (height - level - 1)))
+
+    def _compress(self):
+        while sum(map(len, self.compactors)) > sum(
+                map(self._capacity, range(len(self.compactors)))):
+            for level, compactor in enumerate(self.compactors):
+                if len(compactor) >= self._capacity(level):
+                    if level + 1 == len(self.compactors):
+                        self.compactors.append([])
+                    compactor.sort()
+                    # an odd item stays at its level: the weight is kept
+                    odd = compactor.pop() if len(compactor) % 2 else None
+                    offset = self._random.getrandbits(1)
+                    self.compactors[level + 1].extend(compactor[offset::2])
+                    compactor.clear()
+                    if odd is not None:
+                        compactor.append(odd)
+                    break
+
+    def add(self, value):
+        self.compactors[0].append(value)
+        self.total += 1
+        if len(self.compactors[0]) >= self._capacity(0):
+            self._compress()
+        return self
+
+    def update(self, iterable):
+        for value in iterable:
+            self.add(value)
+        return self
+
+    def merge(self, other):
+        _check_mergeable(self, other, 'k')
+        while len(self.compactors) < len(other.compactors):
+            self.compactors.append([])
+        for compactor, other_compactor in zip(self.compactors, other.compactors):
+            compactor.extend(other_compactor)
+        self.total += other.total
+        self._compress()
+        return self
+
+    def values(self):
+        """Return the sorted list of stored (value, weight)"""
+        return sorted((v, 1 << level)
+                      for level, compactor in enumerate(self.compactors)
+                      for v in compactor)
+
+    def rank(self, value):
+        """Return the estimated fraction of the values that are lower than `value`"""
+        values = self.values()
+        if not values:
+            raise ValueError("empty sketch")
+        lower = sum(w for v, w in values if v < value)
+        return lower / sum(w for _, w in values)
+
+    def quantile(self, q):
+        """Return the estimated `q`-quantile"""
+        values = self.values()
+        if not values:
+            raise ValueError("empty sketch")
+        target = q * sum(w for _, w in values)
+        cumulated = 0
+        for v, w in values:
+            cumulated += w
+            if cumulated > target:
+                return v
+        return values[-1][0]
+
+    def __repr__(self):
+        return f"KLL(k={self.k})"